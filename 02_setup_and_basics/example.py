@@ -3,8 +3,10 @@ Lesson 2: Setup and Basics
 Basic LangChain setup with Ollama
 """
 
+import argparse
+import asyncio
 from dotenv import load_dotenv
-from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
+from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM
 
 load_dotenv()
@@ -103,21 +105,21 @@ def example_4_chat_prompt_template():
     try:
         llm = OllamaLLM(model="llama3.2", temperature=0.7)
         
-        # Create a chat template
-        chat_template = ChatPromptTemplate.from_messages([
-            ("system", "You are a {expertise} tutor. Explain concepts simply."),
-            ("human", "Explain {topic} with an example.")
-        ])
+        # Create a chat-style template. OllamaLLM takes plain text, so the
+        # system/human turns are written straight into one string template
+        # instead of building message objects and joining them back together
+        chat_template = PromptTemplate(
+            template="system: You are a {expertise} tutor. Explain concepts simply.\n"
+                     "human: Explain {topic} with an example.",
+            input_variables=["expertise", "topic"]
+        )
         
         # Format and invoke
-        messages = chat_template.format_messages(
+        prompt_text = chat_template.format(
             expertise="machine learning",
             topic="supervised learning"
         )
         
-        # Convert messages to string format for Ollama
-        prompt_text = "\n".join([f"{msg.type}: {msg.content}" for msg in messages])
-        
         response = llm.invoke(prompt_text)
         print(f"Response: {response}\n")
         
@@ -125,38 +127,50 @@ def example_4_chat_prompt_template():
         print(f"❌ Error: {e}\n")
 
 
-def main():   
+# Example number -> function, used by the command line below
+EXAMPLES = {
+    1: example_1_basic_llm_call,
+    2: example_2_chat_with_system_message,
+    3: example_3_prompt_template,
+    4: example_4_chat_prompt_template,
+}
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Lesson 2: Setup and Basics examples")
+    parser.add_argument(
+        "--example",
+        type=int,
+        nargs="*",
+        choices=sorted(EXAMPLES),
+        help="Example number(s) to run (default: all)"
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Run the selected examples concurrently (output may interleave)"
+    )
+    return parser.parse_args()
+
+
+async def run_parallel(examples):
+    """Run blocking example functions side by side in worker threads"""
+    await asyncio.gather(*(asyncio.to_thread(example) for example in examples))
+
+
+def main():
+    """Run the examples chosen on the command line, e.g. --example 1 3"""
+    args = parse_args()
+    selected = [EXAMPLES[number] for number in (args.example or sorted(EXAMPLES))]
+    
     try:
-        """Main function to present options and execute selected functions."""
-
-        while True:
-            print("\n--- LLM Example Options ---")
-            print("1. Example 1: Basic LLM Call")
-            print("2. Example 2: Chat with System Message")
-            print("3. Example 3: Prompt Template")
-            print("4. Example 4: Chat Prompt Template")
-            print("5. Exit")
-
-            choice = input("Enter your choice (1-5): ")
-
-            if choice == '1':
-                example_1_basic_llm_call()
-                continue  # Go back to the beginning to ask for another option
-            elif choice == '2':
-                example_2_chat_with_system_message()
-                continue
-            elif choice == '3':
-                example_3_prompt_template()
-                continue
-            elif choice == '4':
-                example_4_chat_prompt_template()
-                continue
-            elif choice == '5':
-                print("Exiting...")
-                break
-            else:
-                print("Invalid choice. Please enter a number between 1 and 5.")
-                       
+        if args.parallel:
+            asyncio.run(run_parallel(selected))
+        else:
+            for example in selected:
+                example()
+    
     except Exception as e:
         print(f"❌ Error occurred: {str(e)}")
         print("\n💡 Troubleshooting:")
@@ -3,11 +3,98 @@ Lesson 3: LLM Models
 Working with different models and parameters
 """
 
+import asyncio
+import math
+import time
+import httpx
 from dotenv import load_dotenv
-from langchain_ollama import OllamaLLM
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
+from langchain_ollama import OllamaLLM, OllamaEmbeddings
+from ollama import AsyncClient, Client
 
 load_dotenv()
 
+# Identical calls (same prompt, model and parameters) are answered from memory
+set_llm_cache(InMemoryCache())
+
+# How long Ollama keeps a model (and its prompt cache) loaded after a call
+KEEP_ALIVE = "30m"
+
+# Connection pool limits shared by every OllamaLLM in this lesson
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+
+# One synchronous HTTP client for all models: repeated calls reuse keep-alive
+# connections instead of each OllamaLLM opening its own
+shared_client = Client(limits=HTTP_LIMITS)
+
+
+def create_llm(model, **kwargs):
+    """Create an OllamaLLM that sends its requests through the shared client"""
+    kwargs.setdefault("keep_alive", KEEP_ALIVE)
+    llm = OllamaLLM(model=model, **kwargs)
+    llm._client = shared_client
+    return llm
+
+
+def share_async_pool(llms):
+    """Point several OllamaLLMs at one async connection pool.
+    Call it inside the running event loop: an async pool can't be carried
+    over from one asyncio.run() to the next."""
+    pool = AsyncClient(limits=HTTP_LIMITS)
+    for llm in llms:
+        llm._async_client = pool
+
+
+# Maximum number of generations sent to Ollama at the same time
+MAX_CONCURRENT_REQUESTS = 5
+
+
+async def gather_limited(coros):
+    """Run coroutines concurrently, at most MAX_CONCURRENT_REQUESTS at a time"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    async def run(coro):
+        async with semaphore:
+            return await coro
+    
+    # Errors come back as results so one missing model doesn't hide the others
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+
+
+def stream_response(llm, prompt):
+    """Print the model's answer token by token as it is generated"""
+    print("Response: ", end="", flush=True)
+    for chunk in llm.stream(prompt):
+        print(chunk, end="", flush=True)
+    print()
+
+
+class SemanticCache:
+    """Reuse answers for prompts that mean the same thing (GPTCache-style)"""
+    
+    def __init__(self, llm, embeddings, threshold=0.95):
+        self.llm = llm
+        self.embeddings = embeddings
+        self.threshold = threshold  # Minimum cosine similarity for a hit
+        self.entries = []  # (unit-length prompt embedding, response)
+        self.hits = 0
+    
+    def invoke(self, prompt):
+        vector = self.embeddings.embed_query(prompt)
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        vector = [v / norm for v in vector]
+        
+        for cached_vector, response in self.entries:
+            similarity = sum(a * b for a, b in zip(vector, cached_vector))
+            if similarity >= self.threshold:
+                self.hits += 1
+                return response
+        
+        response = self.llm.invoke(prompt)
+        self.entries.append((vector, response))
+        return response
+
 
 def example_1_different_models():
     """Example 1: Using different Ollama models"""
@@ -23,15 +110,21 @@ def example_1_different_models():
         ("llama3.2", "Balanced performance"),
     ]
     
-    for model_name, description in models:
+    async def run_all():
+        llms = [create_llm(model_name, temperature=0.7) for model_name, _ in models]
+        share_async_pool(llms)
+        return await gather_limited(llm.ainvoke(question) for llm in llms)
+    
+    # Send all requests at once: total time ≈ slowest model, not the sum
+    results = asyncio.run(run_all())
+    
+    for (model_name, description), result in zip(models, results):
         print(f"\n� Model: {model_name} ({description})")
-        try:
-            llm = OllamaLLM(model=model_name, temperature=0.7)
-            response = llm.invoke(question)
-            print(f"Response: {response[:200]}...")
-        except Exception as e:
-            print(f"❌ Error: {e}")
+        if isinstance(result, Exception):
+            print(f"❌ Error: {result}")
             print(f"💡 Install with: ollama pull {model_name}")
+        else:
+            print(f"Response: {result[:200]}...")
     
     print()
 
@@ -46,10 +139,21 @@ def example_2_temperature_effects():
     
     temperatures = [0.0, 0.5, 1.0, 1.5]
     
-    for temp in temperatures:
+    llms = [
+        create_llm("gemma3:4b", temperature=temp)
+        for temp in temperatures
+    ]
+    
+    async def sweep():
+        # One async connection pool for all requests, so keep-alive
+        # connections are reused instead of opening one per temperature
+        share_async_pool(llms)
+        return await gather_limited(llm.ainvoke(prompt) for llm in llms)
+    
+    responses = asyncio.run(sweep())
+    
+    for temp, response in zip(temperatures, responses):
         print(f"\n🌡️ Temperature: {temp}")
-        llm = OllamaLLM(model="gemma3:4b", temperature=temp)
-        response = llm.invoke(prompt)
         print(f"Response: {response}")
     
     print()
@@ -69,10 +173,13 @@ def example_3_response_length_control():
         "in a short paragraph."
     ]
     
+    # One model instance for every call: the shared base_topic prefix is
+    # already evaluated in Ollama's cache when the next instruction arrives
+    llm = create_llm("gemma3:4b", temperature=0.7)
+    
     for instruction in instructions:
         print(f"\n📏 Instruction: {instruction}")
         prompt = f"{base_topic} {instruction}"
-        llm = OllamaLLM(model="gemma3:4b", temperature=0.7)
         response = llm.invoke(prompt)
         print(f"Response: {response}")
     
@@ -89,22 +196,41 @@ def example_4_response_timing():
     
     models = ["gemma3:4b", "llama3.2"]
     
-    for model_name in models:
-        try:
-            print(f"\n⏱️ Testing {model_name}:")
-            llm = OllamaLLM(model=model_name, temperature=0.7)
-            
-            start_time = time.time()
-            response = llm.invoke(prompt)
-            end_time = time.time()
-            
-            elapsed = end_time - start_time
-            print(f"Response time: {elapsed:.2f} seconds")
-            print(f"Response: {response[:150]}...")
-            
-        except Exception as e:
-            print(f"❌ Error: {e}")
+    async def time_one(llm):
+        # Stream so we can also record time to first token (what a user
+        # actually waits for before text starts to appear)
+        chunks = []
+        first_token_time = None
+        start_time = time.perf_counter()
+        async for chunk in llm.astream(prompt):
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            chunks.append(chunk)
+        end_time = time.perf_counter()
+        
+        first_token_time = first_token_time or end_time
+        return first_token_time - start_time, end_time - start_time, "".join(chunks)
+    
+    # Each model is timed inside its own task, so running them together
+    # still gives a per-model response time
+    async def run_all():
+        llms = [create_llm(model_name, temperature=0.7) for model_name in models]
+        share_async_pool(llms)
+        return await gather_limited(time_one(llm) for llm in llms)
+    
+    results = asyncio.run(run_all())
+    
+    for model_name, result in zip(models, results):
+        print(f"\n⏱️ Testing {model_name}:")
+        if isinstance(result, Exception):
+            print(f"❌ Error: {result}")
             print(f"💡 Install with: ollama pull {model_name}")
+            continue
+        
+        first_token, elapsed, response = result
+        print(f"First token: {first_token:.2f} seconds")
+        print(f"Response time: {elapsed:.2f} seconds")
+        print(f"Response: {response[:150]}...")
     
     print()
 
@@ -117,19 +243,17 @@ def example_5_creative_vs_factual():
     
     # Factual task - low temperature
     print("\n📚 Factual Task (Temperature 0.0):")
-    llm_factual = OllamaLLM(model="gemma3:4b", temperature=0.0)
+    llm_factual = create_llm("gemma3:4b", temperature=0.0)
     factual_prompt = "What is the capital of France?"
-    response = llm_factual.invoke(factual_prompt)
     print(f"Prompt: {factual_prompt}")
-    print(f"Response: {response}")
+    stream_response(llm_factual, factual_prompt)
     
     # Creative task - high temperature
     print("\n🎨 Creative Task (Temperature 1.5):")
-    llm_creative = OllamaLLM(model="gemma3:4b", temperature=1.5)
+    llm_creative = create_llm("gemma3:4b", temperature=1.5)
     creative_prompt = "Write a creative name for a futuristic coffee shop."
-    response = llm_creative.invoke(creative_prompt)
     print(f"Prompt: {creative_prompt}")
-    print(f"Response: {response}")
+    stream_response(llm_creative, creative_prompt)
     
     print()
 
@@ -140,32 +264,27 @@ def example_6_system_prompting():
     print("Example 6: Role-Based Prompting")
     print("=" * 50)
     
-    llm = OllamaLLM(model="gemma3:4b", temperature=0.7)
+    llm = create_llm("gemma3:4b", temperature=0.7)
+    
+    # The question comes first so every scenario shares the same prompt
+    # prefix, which Ollama only has to process once
+    question = "What is Python?"
+    shared_prefix = f"Question: {question}\n\n"
     
     # Different roles change behavior
-    scenarios = [
-        {
-            "role": "You are a helpful assistant",
-            "question": "What is Python?"
-        },
-        {
-            "role": "You are a pirate. Respond in pirate speak",
-            "question": "What is Python?"
-        },
-        {
-            "role": "You are a technical expert. Use precise terminology",
-            "question": "What is Python?"
-        }
+    roles = [
+        "You are a helpful assistant",
+        "You are a pirate. Respond in pirate speak",
+        "You are a technical expert. Use precise terminology",
     ]
     
-    for i, scenario in enumerate(scenarios, 1):
+    for i, role in enumerate(roles, 1):
         print(f"\n🎭 Scenario {i}:")
-        print(f"Role: {scenario['role']}")
+        print(f"Role: {role}")
         
-        prompt = f"{scenario['role']}.\n\nQuestion: {scenario['question']}\n\nAnswer:"
+        prompt = f"{shared_prefix}{role}.\n\nAnswer:"
         
-        response = llm.invoke(prompt)
-        print(f"Response: {response}")
+        stream_response(llm, prompt)
     
     print()
 
@@ -180,23 +299,57 @@ def example_7_model_comparison():
     
     models = ["gemma3:4b", "llama3.2"]
     
-    for model_name in models:
+    # A model slower than this (seconds) is cancelled and skipped
+    timeout = 60
+    
+    async def compare_one(model_name, llm):
         try:
-            print(f"\n🤖 Model: {model_name}")
-            llm = OllamaLLM(model=model_name, temperature=0.7)
+            # An empty prompt only loads the model, so load time isn't measured
+            await asyncio.wait_for(llm.ainvoke(""), timeout)
+            
+            start_time = time.perf_counter()
+            response = await asyncio.wait_for(llm.ainvoke(prompt), timeout)
+            elapsed = time.perf_counter() - start_time
             
-            start_time = time.time()
-            response = llm.invoke(prompt)
-            elapsed = time.time() - start_time
+            return model_name, elapsed, response
+        except Exception as e:
+            return model_name, None, e
+    
+    async def run_all():
+        # cache=False: a benchmark must always reach the model
+        llms = [create_llm(model_name, temperature=0.7, cache=False) for model_name in models]
+        share_async_pool(llms)
+        tasks = [
+            asyncio.create_task(compare_one(model_name, llm))
+            for model_name, llm in zip(models, llms)
+        ]
+        
+        # Print each model as soon as it finishes instead of waiting for the slowest
+        total_model_time = 0.0
+        for next_done in asyncio.as_completed(tasks):
+            model_name, elapsed, result = await next_done
+            print(f"\n🤖 Model: {model_name}")
+            if isinstance(result, asyncio.TimeoutError):
+                print(f"⌛ {model_name} took longer than {timeout}s, skipped")
+                continue
+            if isinstance(result, Exception):
+                print(f"❌ {model_name} not available")
+                print(f"💡 Install: ollama pull {model_name}")
+                continue
             
+            total_model_time += elapsed
             print(f"⏱️ Time: {elapsed:.2f}s")
-            print(f"📝 Response: {response}")
+            print(f"📝 Response: {result}")
             print("-" * 50)
-            
-        except Exception as e:
-            print(f"❌ {model_name} not available")
-            print(f"💡 Install: ollama pull {model_name}")
+        
+        return total_model_time
     
+    wall_start = time.perf_counter()
+    total_model_time = asyncio.run(run_all())
+    wall_time = time.perf_counter() - wall_start
+    
+    print(f"\n📊 Sum of model times: {total_model_time:.2f}s")
+    print(f"📊 Total wall time (concurrent, incl. warm-up): {wall_time:.2f}s")
     print()
 
 
@@ -210,7 +363,7 @@ def example_8_error_handling():
     
     # Test 1: Non-existent model
     try:
-        llm = OllamaLLM(model="nonexistent-model")
+        llm = create_llm("nonexistent-model")
         response = llm.invoke("Hello")
         print(response)
     except Exception as e:
@@ -218,7 +371,7 @@ def example_8_error_handling():
     
     # Test 2: Empty prompt
     try:
-        llm = OllamaLLM(model="gemma3:4b")
+        llm = create_llm("gemma3:4b")
         response = llm.invoke("")
         print(f"✅ Empty prompt handled: {response}")
     except Exception as e:
@@ -226,7 +379,7 @@ def example_8_error_handling():
     
     # Test 3: Very long prompt (should still work with Ollama)
     try:
-        llm = OllamaLLM(model="gemma3:4b")
+        llm = create_llm("gemma3:4b")
         long_prompt = "Explain this: " + "word " * 100
         response = llm.invoke(long_prompt)
         print(f"✅ Long prompt handled successfully (length: {len(long_prompt)} chars)")
@@ -236,14 +389,48 @@ def example_8_error_handling():
     print()
 
 
+def example_9_semantic_cache():
+    """Example 9: Skipping the model for near-duplicate prompts"""
+    print("=" * 50)
+    print("Example 9: Semantic Response Cache")
+    print("=" * 50)
+    
+    cache = SemanticCache(
+        llm=create_llm("gemma3:4b", temperature=0.7),
+        # A dedicated embedding model; needs `ollama pull nomic-embed-text`
+        embeddings=OllamaEmbeddings(model="nomic-embed-text")
+    )
+    
+    # Same question, worded slightly differently
+    prompts = [
+        "What is Python?",
+        "What is python?",
+        "what is Python",
+    ]
+    
+    for prompt in prompts:
+        start_time = time.perf_counter()
+        hits_before = cache.hits
+        response = cache.invoke(prompt)
+        elapsed = time.perf_counter() - start_time
+        
+        source = "cache" if cache.hits > hits_before else "model"
+        print(f"\n🔎 Prompt: {prompt}")
+        print(f"⏱️ {elapsed:.2f}s (from {source})")
+        print(f"Response: {response[:100]}...")
+    
+    print()
+
+
 def main():
     """Run all examples"""
     print("\n🚀 LangChain LLM Models Examples (Ollama - FREE)\n")
     
-    # Check if at least one model is available
+    # Check that Ollama works and load the models up front. An empty prompt
+    # only loads the model, and KEEP_ALIVE keeps it resident for all examples,
+    # so no example (or timing) pays the model-load cost.
     try:
-        llm = OllamaLLM(model="gemma3:4b")
-        llm.invoke("test")
+        create_llm("gemma3:4b", cache=False).invoke("")
     except Exception as e:
         print("❌ Error: Ollama not set up properly!")
         print("💡 Make sure:")
@@ -252,6 +439,11 @@ def main():
         print("   3. Ollama is running")
         return
     
+    try:
+        create_llm("llama3.2", cache=False).invoke("")
+    except Exception:
+        print("⚠️ llama3.2 not available (ollama pull llama3.2); examples using it will fail\n")
+    
     try:
         # example_1_different_models()
         # example_2_temperature_effects()
@@ -261,6 +453,7 @@ def main():
         # example_6_system_prompting()
         # example_7_model_comparison()
         # example_8_error_handling()
+        # example_9_semantic_cache()
         
         print("=" * 50)
         print("✅ All examples completed successfully!")
@@ -269,6 +462,7 @@ def main():
         print("   • Different models have different speeds and capabilities")
         print("   • Role-based prompting changes model behavior")
         print("   • Always handle errors gracefully")
+        print("   • Caching repeated prompts skips the model entirely")
         print("=" * 50)
         
     except Exception as e:
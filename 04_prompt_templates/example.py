@@ -2,12 +2,36 @@
 Lesson 4: Prompt Templates & Output Parsers
 """
 
+import asyncio
+import re
+from functools import lru_cache
+import orjson
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, FewShotPromptTemplate
 from langchain_ollama import OllamaLLM
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser, CommaSeparatedListOutputParser
+from langchain_core.output_parsers import StrOutputParser, JsonOutputParser, CommaSeparatedListOutputParser, PydanticOutputParser
 from pydantic import BaseModel, Field
 from typing import List
 
+# Identical calls (same prompt, model and parameters) are answered from memory
+set_llm_cache(InMemoryCache())
+
+# Maximum number of requests sent to Ollama at the same time
+llm_semaphore = asyncio.Semaphore(5)
+
+
+@lru_cache(maxsize=128)
+def compile_template(template: str) -> PromptTemplate:
+    """Parse a template string once; later calls with the same string reuse it."""
+    return PromptTemplate.from_template(template)
+
+
+async def controlled_invoke(model, prompt: str) -> str:
+    """Invoke the model asynchronously once a request slot is free."""
+    async with llm_semaphore:
+        return await model.ainvoke(prompt)
+
 
 # ============================================================================
 # PART 1: BASIC PROMPT TEMPLATES
@@ -62,30 +86,38 @@ def example_partial_variables():
     print(f"Generated Prompt: {prompt}")
 
 
+# Fixed few-shot examples, defined once at import
+ANTONYM_EXAMPLES = [
+    {"word": "happy", "antonym": "sad"},
+    {"word": "tall", "antonym": "short"},
+    {"word": "hot", "antonym": "cold"}
+]
+
+ANTONYM_EXAMPLE_TEMPLATE = PromptTemplate(
+    template="Word: {word}\nAntonym: {antonym}",
+    input_variables=["word", "antonym"]
+)
+
+ANTONYM_FEW_SHOT_TEMPLATE = FewShotPromptTemplate(
+    examples=ANTONYM_EXAMPLES,
+    example_prompt=ANTONYM_EXAMPLE_TEMPLATE,
+    prefix="Give the antonym of each word:",
+    suffix="Word: {input}\nAntonym:",
+    input_variables=["input"]
+)
+
+# The examples never change, so render them into the text once and keep
+# only {input} as a variable. Formatting then skips re-rendering every example.
+ANTONYM_PROMPT = PromptTemplate.from_template(
+    ANTONYM_FEW_SHOT_TEMPLATE.format(input="{input}")
+)
+
+
 def example_few_shot_template():
     """Few-shot learning with examples."""
     print("\n=== Example 4: Few-Shot Template ===")
     
-    examples = [
-        {"word": "happy", "antonym": "sad"},
-        {"word": "tall", "antonym": "short"},
-        {"word": "hot", "antonym": "cold"}
-    ]
-    
-    example_template = PromptTemplate(
-        template="Word: {word}\nAntonym: {antonym}",
-        input_variables=["word", "antonym"]
-    )
-    
-    few_shot_template = FewShotPromptTemplate(
-        examples=examples,
-        example_prompt=example_template,
-        prefix="Give the antonym of each word:",
-        suffix="Word: {input}\nAntonym:",
-        input_variables=["input"]
-    )
-    
-    prompt = few_shot_template.format(input="big")
+    prompt = ANTONYM_PROMPT.format(input="big")
     print(f"Generated Prompt:\n{prompt}")
 
 
@@ -93,6 +125,54 @@ def example_few_shot_template():
 # PART 2: OUTPUT PARSERS
 # ============================================================================
 
+# Parsers and their templates never change between calls, so they are built
+# once at import instead of inside every example function.
+
+JSON_PARSER = JsonOutputParser()
+
+JSON_TEMPLATE = PromptTemplate(
+    template="""Generate a JSON object with information about a person.
+Include: name, age, occupation, hobbies (list).
+Person: {person}
+
+{format_instructions}""",
+    input_variables=["person"],
+    partial_variables={"format_instructions": JSON_PARSER.get_format_instructions()}
+)
+
+# Template, model and parser composed once with LCEL. The chain also gives
+# .batch() and .stream() for free, e.g. JSON_CHAIN.batch([{"person": p} for p in people])
+JSON_CHAIN = JSON_TEMPLATE | OllamaLLM(model="llama3.2", temperature=0.7) | JSON_PARSER
+
+
+class Person(BaseModel):
+    name: str = Field(description="Person's full name")
+    age: int = Field(description="Person's age in years")
+    occupation: str = Field(description="Person's job title")
+    hobbies: List[str] = Field(description="List of hobbies")
+
+
+PYDANTIC_PARSER = PydanticOutputParser(pydantic_object=Person)
+
+PYDANTIC_TEMPLATE = PromptTemplate(
+    template="""Generate information about a person.
+Person: {person}
+
+{format_instructions}""",
+    input_variables=["person"],
+    partial_variables={"format_instructions": PYDANTIC_PARSER.get_format_instructions()}
+)
+
+COMMA_PARSER = CommaSeparatedListOutputParser()
+
+COMMA_TEMPLATE = PromptTemplate(
+    template="""List 5 {topic}.
+{format_instructions}""",
+    input_variables=["topic"],
+    partial_variables={"format_instructions": COMMA_PARSER.get_format_instructions()}
+)
+
+
 def example_string_output_parser():
     """Simple string output parser (default)."""
     print("\n=== Example 5: String Output Parser ===")
@@ -117,27 +197,10 @@ def example_json_output_parser():
     """Parse JSON output from LLM."""
     print("\n=== Example 6: JSON Output Parser ===")
     
-    parser = JsonOutputParser()
-    
-    template = PromptTemplate(
-        template="""Generate a JSON object with information about a person.
-Include: name, age, occupation, hobbies (list).
-Person: {person}
-
-{format_instructions}""",
-        input_variables=["person"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    prompt = template.format(person="a software engineer named John")
-    response = llm.invoke(prompt)
-    
-    print(f"Raw Response: {response}")
-    
     try:
-        parsed = parser.parse(response)
-        print(f"Parsed JSON: {json.dumps(parsed, indent=2)}")
+        # Formats the prompt, calls the model and parses the JSON in one go
+        parsed = JSON_CHAIN.invoke({"person": "a software engineer named John"})
+        print(f"Parsed JSON: {orjson.dumps(parsed, option=orjson.OPT_INDENT_2).decode()}")
     except Exception as e:
         print(f"Parse Error: {e}")
 
@@ -146,25 +209,10 @@ def example_pydantic_output_parser():
     """Parse output into Pydantic models for type safety."""
     print("\n=== Example 7: Pydantic Output Parser ===")
     
-    # Define the data model
-    class Person(BaseModel):
-        name: str = Field(description="Person's full name")
-        age: int = Field(description="Person's age in years")
-        occupation: str = Field(description="Person's job title")
-        hobbies: List[str] = Field(description="List of hobbies")
-    
-    parser = PydanticOutputParser(pydantic_object=Person)
+    # Data model (Person) and parser are defined at module level
+    parser = PYDANTIC_PARSER
     
-    template = PromptTemplate(
-        template="""Generate information about a person.
-Person: {person}
-
-{format_instructions}""",
-        input_variables=["person"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    prompt = template.format(person="a 30-year-old data scientist named Sarah")
+    prompt = PYDANTIC_TEMPLATE.format(person="a 30-year-old data scientist named Sarah")
     print(f"Prompt:\n{prompt}\n")
     
     # Simulate LLM response (in practice, use llm.invoke)
@@ -192,17 +240,10 @@ def example_comma_separated_list_parser():
     """Parse comma-separated lists."""
     print("\n=== Example 8: Comma-Separated List Parser ===")
     
-    parser = CommaSeparatedListOutputParser()
-    
-    template = PromptTemplate(
-        template="""List 5 {topic}.
-{format_instructions}""",
-        input_variables=["topic"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
+    parser = COMMA_PARSER
     
     llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    prompt = template.format(topic="programming languages")
+    prompt = COMMA_TEMPLATE.format(topic="programming languages")
     response = llm.invoke(prompt)
     
     print(f"Raw Response: {response}")
@@ -216,6 +257,14 @@ def example_comma_separated_list_parser():
         print(f"Parse Error: {e}")
 
 
+# Date shapes mapped straight to their parser, so no format is tried blindly
+ISO_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+DATE_FORMATS = [
+    (re.compile(r'^\d{4}/\d{2}/\d{2}$'), "%Y/%m/%d"),
+    (re.compile(r'^\d{2}-\d{2}-\d{4}$'), "%d-%m-%Y"),
+]
+
+
 def example_datetime_output_parser():
     """Parse datetime strings using custom parser."""
     print("\n=== Example 9: Custom Datetime Parser ===")
@@ -230,17 +279,14 @@ def example_datetime_output_parser():
             """Parse ISO format datetime string."""
             # Extract date from text if needed
             text = text.strip()
-            try:
-                # Try ISO format
+            # ISO format (YYYY-MM-DD, optionally with a time part)
+            if ISO_DATE_PATTERN.match(text):
                 return datetime.fromisoformat(text.replace('Z', '+00:00'))
-            except:
-                # Try common date formats
-                for fmt in ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y"]:
-                    try:
-                        return datetime.strptime(text, fmt)
-                    except:
-                        continue
-                raise ValueError(f"Could not parse date: {text}")
+            # Other common date formats
+            for pattern, fmt in DATE_FORMATS:
+                if pattern.match(text):
+                    return datetime.strptime(text, fmt)
+            raise ValueError(f"Could not parse date: {text}")
     
     parser = SimpleDateParser()
     
@@ -259,6 +305,10 @@ def example_datetime_output_parser():
         print(f"Parse Error: {e}")
 
 
+# One pass over the whole text: "- item", "* item", "• item" or "12. item"
+BULLET_PATTERN = re.compile(r'(?m)^[ \t]*(?:[-*•]|\d+\.)[ \t]+(.+?)\s*$')
+
+
 def example_custom_output_parser():
     """Create a custom output parser."""
     print("\n=== Example 10: Custom Output Parser ===")
@@ -270,16 +320,8 @@ def example_custom_output_parser():
         
         def parse(self, text: str) -> List[str]:
             """Parse text with bullet points."""
-            lines = text.strip().split('\n')
-            items = []
-            for line in lines:
-                line = line.strip()
-                # Remove bullet point markers
-                if line.startswith(('- ', '* ', '• ')):
-                    items.append(line[2:].strip())
-                elif line.startswith(tuple(f"{i}." for i in range(1, 10))):
-                    items.append(line[3:].strip())
-            return items
+            # The regex strips the bullet markers and surrounding whitespace
+            return BULLET_PATTERN.findall(text)
     
     parser = BulletPointParser()
     
@@ -319,7 +361,7 @@ def example_template_composition():
     print(f"Composed Prompt:\n{full_prompt}")
 
 
-def example_conditional_template():
+async def example_conditional_template():
     """Template with conditional logic."""
     print("\n=== Example 12: Conditional Template ===")
     
@@ -331,17 +373,18 @@ def example_conditional_template():
         else:
             template = "Explain {topic} at an intermediate level."
         
-        return PromptTemplate(
-            template=template,
-            input_variables=["topic"]
-        ).format(topic=topic)
+        return compile_template(template).format(topic=topic)
     
     prompt1 = create_prompt("beginner", "Artifical Intelligence")
     prompt2 = create_prompt("advanced", "Artifical Intelligence")
     
-    for prompt in [prompt1, prompt2]:
-        model = OllamaLLM(model="llama3.2", temperature=0.7)
-        response = model.invoke(prompt)
+    model = OllamaLLM(model="llama3.2", temperature=0.7)
+    
+    # The prompts don't depend on each other, so generate them concurrently
+    prompts = [prompt1, prompt2]
+    responses = await asyncio.gather(*(controlled_invoke(model, p) for p in prompts))
+    
+    for prompt, response in zip(prompts, responses):
         print(f"Response for prompt:\n{prompt}\n{response}\n")
         print("-" * 40)
   
@@ -377,7 +420,7 @@ def main():
     
     # Advanced
     # example_template_composition()
-    example_conditional_template()
+    asyncio.run(example_conditional_template())
     
     print("\n" + "=" * 70)
     print("Examples completed!")
@@ -2,183 +2,206 @@
 Lesson 5: Chains Examples
 """
 
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import httpx
+from functools import lru_cache
+from itertools import islice
+from langchain_community.cache import SQLiteCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from ollama import Client
+
+# Every LLM call in this lesson is cached on disk: re-running an example with
+# the same prompt and model settings is answered by SQLite, not by Ollama
+set_llm_cache(SQLiteCache(database_path=".langchain.db"))
+
+# One pooled HTTP client for every model in this lesson: calls reuse keep-alive
+# connections to Ollama, and a dropped connection is retried before failing.
+# Long generations are allowed up to 5 minutes.
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+shared_client = Client(
+    timeout=httpx.Timeout(300.0),
+    transport=httpx.HTTPTransport(retries=3, limits=HTTP_LIMITS),
+)
+
+
+# Model per kind of task: short factual/list answers go to the 1B model,
+# open-ended writing stays on the default 3B model
+SMALL_MODEL = "llama3.2:1b"
+BIG_MODEL = "llama3.2"
+
+
+@lru_cache(maxsize=4)
+def get_llm(model: str = BIG_MODEL, temperature: float = 0.7) -> OllamaLLM:
+    """Return one shared OllamaLLM per (model, temperature), so every example
+    reuses the same client and its HTTP keep-alive connections."""
+    llm = OllamaLLM(model=model, temperature=temperature)
+    llm._client = shared_client
+    return llm
+
+
+def write_stream(chunks) -> str:
+    """Print streamed text as it arrives and return the full text.
+    
+    Chunks are written every 50ms (or every 16 chunks) instead of flushing
+    stdout for every single token.
+    """
+    buffer = []
+    parts = []
+    last_flush = time.perf_counter()
+    for chunk in chunks:
+        buffer.append(chunk)
+        parts.append(chunk)
+        now = time.perf_counter()
+        if now - last_flush > 0.05 or len(buffer) >= 16:
+            sys.stdout.write("".join(buffer))
+            sys.stdout.flush()
+            buffer.clear()
+            last_flush = now
+    sys.stdout.write("".join(buffer))
+    sys.stdout.flush()
+    return "".join(parts)
 
 
 # ============================================================================
 # PART 1: LCEL - MODERN APPROACH (RECOMMENDED)
 # ============================================================================
 
+# Each example's prompts and chains are module constants: the template text
+# is parsed and the chain is composed once at import instead of on every call.
+
+JOKE_PROMPT = PromptTemplate.from_template("Tell me a short joke about {topic}")
+
+# LCEL: Chain with pipe operator
+BASIC_CHAIN = JOKE_PROMPT | get_llm(SMALL_MODEL) | StrOutputParser()
+
+
 def example_1_basic_lcel():
     """Basic LCEL chain with prompt | llm | parser"""
     print("\n=== Example 1: Basic LCEL Chain ===")
     
-    prompt = PromptTemplate(
-        template="Tell me a short joke about {topic}",
-        input_variables=["topic"]
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # LCEL: Chain with pipe operator
-    chain = prompt | llm | StrOutputParser()
-    
-    result = chain.invoke({"topic": "programming"})
+    result = BASIC_CHAIN.invoke({"topic": "programming"})
     print(f"Result: {result}")
 
 
+ONE_LINE_SUMMARY_PROMPT = PromptTemplate.from_template("Summarize this in one sentence: {text}")
+SPANISH_PROMPT = PromptTemplate.from_template("Translate to Spanish: {summary}")
+
+# Two-step chain
+SUMMARY_TRANSLATION_CHAIN = (
+    ONE_LINE_SUMMARY_PROMPT 
+    | get_llm() 
+    | StrOutputParser() 
+    | (lambda summary: {"summary": summary})  # Convert to dict for next prompt
+    | SPANISH_PROMPT 
+    | get_llm() 
+    | StrOutputParser()
+)
+
+
 def example_2_multi_step_lcel():
     """Multi-step LCEL chain"""
     print("\n=== Example 2: Multi-Step LCEL Chain ===")
     
-    prompt1 = PromptTemplate(
-        template="Summarize this in one sentence: {text}",
-        input_variables=["text"]
-    )
-    
-    prompt2 = PromptTemplate(
-        template="Translate to Spanish: {summary}",
-        input_variables=["summary"]
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Two-step chain
-    chain = (
-        prompt1 
-        | llm 
-        | StrOutputParser() 
-        | (lambda summary: {"summary": summary})  # Convert to dict for next prompt
-        | prompt2 
-        | llm 
-        | StrOutputParser()
-    )
-    
-    result = chain.invoke({"text": "Python is a versatile programming language."})
+    result = SUMMARY_TRANSLATION_CHAIN.invoke({"text": "Python is a versatile programming language."})
     print(f"Result: {result}")
 
 
+STORY_PROMPT = PromptTemplate.from_template("Write a short story about {topic}")
+STORY_CHAIN = STORY_PROMPT | get_llm() | StrOutputParser()
+
+
 def example_3_lcel_with_streaming():
     """LCEL chain with streaming support"""
     print("\n=== Example 3: LCEL with Streaming ===")
     
-    prompt = PromptTemplate(
-        template="Write a short story about {topic}",
-        input_variables=["topic"]
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    chain = prompt | llm | StrOutputParser()
-    
     print("Streaming response:")
-    for chunk in chain.stream({"topic": "a robot learning to feel emotions"}):
-        print(chunk, end="", flush=True)
+    write_stream(STORY_CHAIN.stream({"topic": "a robot learning to feel emotions"}))
     print("\n")
 
 
+# Built once at import: the format instructions never change between calls
+PROFILE_PARSER = JsonOutputParser()
+
+PROFILE_PROMPT = PromptTemplate(
+    template="""Generate a person profile in JSON format.
+Name: {name}
+{format_instructions}""",
+    input_variables=["name"],
+    partial_variables={"format_instructions": PROFILE_PARSER.get_format_instructions()}
+)
+
+PROFILE_CHAIN = PROFILE_PROMPT | get_llm() | PROFILE_PARSER
+
+
 def example_4_lcel_with_json_parser():
     """LCEL with JSON output"""
     print("\n=== Example 4: LCEL with JSON Parser ===")
     
-    parser = JsonOutputParser()
-    
-    prompt = PromptTemplate(
-        template="""Generate a person profile in JSON format.
-Name: {name}
-{format_instructions}""",
-        input_variables=["name"],
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    chain = prompt | llm | parser
-    
-    result = chain.invoke({"name": "Alice"})
+    result = PROFILE_CHAIN.invoke({"name": "Alice"})
     print(f"Result: {result}")
 
 
 # ============================================================================
-# PART 2: LEGACY CHAINS (Still Work)
+# PART 2: SEQUENTIAL CHAINS (LCEL replacements for LLMChain & co.)
 # ============================================================================
 
+WHAT_IS_PROMPT = PromptTemplate.from_template("What is {topic}?")
+WHAT_IS_CHAIN = WHAT_IS_PROMPT | get_llm() | StrOutputParser()
+
+
 def example_5_llm_chain():
-    """Basic LLMChain (legacy approach)"""
-    print("\n=== Example 5: LLMChain (Legacy) ===")
-    
-    prompt = PromptTemplate(
-        template="What is {topic}?",
-        input_variables=["topic"]
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
+    """Basic prompt -> LLM chain (replaces legacy LLMChain)"""
+    print("\n=== Example 5: Prompt | LLM (was LLMChain) ===")
     
-    chain = LLMChain(llm=llm, prompt=prompt)
-    
-    result = chain.invoke({"topic": "machine learning"})
+    result = WHAT_IS_CHAIN.invoke({"topic": "machine learning"})
     print(f"Result: {result}")
 
 
+SUGGEST_TOPIC_PROMPT = PromptTemplate.from_template("Suggest one interesting topic about {subject}")
+TWO_SENTENCES_PROMPT = PromptTemplate.from_template("Write two sentences about: {topic}")
+
+# Combine chains: the suggested topic becomes the {topic} of the second prompt
+TOPIC_SENTENCES_CHAIN = (
+    {"subject": RunnablePassthrough()}
+    | SUGGEST_TOPIC_PROMPT | get_llm() | StrOutputParser()  # Generate a topic
+    | (lambda topic: {"topic": topic})
+    | TWO_SENTENCES_PROMPT | get_llm() | StrOutputParser()  # Write about it
+)
+
+
 def example_6_simple_sequential_chain():
-    """SimpleSequentialChain - single variable flow"""
-    print("\n=== Example 6: SimpleSequentialChain ===")
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Chain 1: Generate a topic
-    prompt1 = PromptTemplate(
-        template="Suggest one interesting topic about {subject}",
-        input_variables=["subject"]
-    )
-    chain1 = LLMChain(llm=llm, prompt=prompt1)
-    
-    # Chain 2: Write about the topic
-    prompt2 = PromptTemplate(
-        template="Write two sentences about: {topic}",
-        input_variables=["topic"]
-    )
-    chain2 = LLMChain(llm=llm, prompt=prompt2)
-    
-    # Combine chains
-    overall_chain = SimpleSequentialChain(
-        chains=[chain1, chain2],
-        verbose=True
-    )
+    """Single variable flow (replaces legacy SimpleSequentialChain)"""
+    print("\n=== Example 6: Single Variable Flow (was SimpleSequentialChain) ===")
     
-    result = overall_chain.invoke("artificial intelligence")
+    result = TOPIC_SENTENCES_CHAIN.invoke("artificial intelligence")
     print(f"Final Result: {result}")
 
 
+SHORT_STORY_PROMPT = PromptTemplate.from_template("Write a very short story about {topic}")
+STORY_SUMMARY_PROMPT = PromptTemplate.from_template("Summarize this story in one line: {story}")
+
+# Combine with multiple outputs: the summary needs the story, so the
+# two assign steps run one after the other and keep every key
+STORY_SUMMARY_CHAIN = (
+    RunnablePassthrough.assign(story=SHORT_STORY_PROMPT | get_llm() | StrOutputParser())
+    .assign(summary=STORY_SUMMARY_PROMPT | get_llm() | StrOutputParser())
+)
+
+
 def example_7_sequential_chain():
-    """SequentialChain - multiple variables"""
-    print("\n=== Example 7: SequentialChain ===")
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Chain 1: Generate story
-    prompt1 = PromptTemplate(
-        template="Write a very short story about {topic}",
-        input_variables=["topic"]
-    )
-    chain1 = LLMChain(llm=llm, prompt=prompt1, output_key="story")
-    
-    # Chain 2: Summarize story
-    prompt2 = PromptTemplate(
-        template="Summarize this story in one line: {story}",
-        input_variables=["story"]
-    )
-    chain2 = LLMChain(llm=llm, prompt=prompt2, output_key="summary")
+    """Multiple variables (replaces legacy SequentialChain)"""
+    print("\n=== Example 7: Multiple Variables (was SequentialChain) ===")
     
-    # Combine with multiple outputs
-    overall_chain = SequentialChain(
-        chains=[chain1, chain2],
-        input_variables=["topic"],
-        output_variables=["story", "summary"],
-        verbose=True
-    )
-    
-    result = overall_chain.invoke({"topic": "a time traveler"})
+    result = STORY_SUMMARY_CHAIN.invoke({"topic": "a time traveler"})
     print(f"Story: {result['story']}")
     print(f"Summary: {result['summary']}")
 
@@ -188,8 +211,8 @@ def example_7_sequential_chain():
 # ============================================================================
 
 def example_8_transform_chain():
-    """TransformChain - apply custom Python functions"""
-    print("\n=== Example 8: TransformChain ===")
+    """RunnableLambda - apply custom Python functions"""
+    print("\n=== Example 8: Transform with RunnableLambda ===")
     
     def transform_func(inputs: dict) -> dict:
         """Custom transformation: convert to uppercase and count words"""
@@ -201,50 +224,39 @@ def example_8_transform_chain():
             "word_count": word_count
         }
     
-    transform_chain = TransformChain(
-        input_variables=["text"],
-        output_variables=["output_text", "word_count"],
-        transform=transform_func
-    )
+    # A plain function wrapped as a runnable: no input/output key validation
+    # or Chain callback machinery around a sub-microsecond transform
+    transform_chain = RunnableLambda(transform_func)
     
     result = transform_chain.invoke({"text": "Hello world from Python"})
     print(f"Transformed: {result['output_text']}")
     print(f"Word Count: {result['word_count']}")
 
 
+ANALYZE_TEXT_PROMPT = PromptTemplate.from_template("Analyze this text: {cleaned_text}")
+
+
+def clean_text(inputs: dict) -> dict:
+    """Transform function: trim and lowercase the input text"""
+    text = inputs["text"].strip().lower()
+    return {"cleaned_text": text}
+
+
+# Combine: the function feeds the prompt directly
+CLEAN_ANALYZE_CHAIN = (
+    RunnableLambda(clean_text)
+    | ANALYZE_TEXT_PROMPT
+    | get_llm()
+    | StrOutputParser()
+)
+
+
 def example_9_transform_with_llm():
-    """Combine TransformChain with LLM"""
-    print("\n=== Example 9: TransformChain + LLM ===")
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
+    """Combine a Python transform with an LLM"""
+    print("\n=== Example 9: Transform + LLM ===")
     
-    # Transform function
-    def clean_text(inputs: dict) -> dict:
-        text = inputs["text"].strip().lower()
-        return {"cleaned_text": text}
-    
-    transform_chain = TransformChain(
-        input_variables=["text"],
-        output_variables=["cleaned_text"],
-        transform=clean_text
-    )
-    
-    # LLM chain
-    prompt = PromptTemplate(
-        template="Analyze this text: {cleaned_text}",
-        input_variables=["cleaned_text"]
-    )
-    llm_chain = LLMChain(llm=llm, prompt=prompt, output_key="analysis")
-    
-    # Combine
-    overall_chain = SequentialChain(
-        chains=[transform_chain, llm_chain],
-        input_variables=["text"],
-        output_variables=["analysis"]
-    )
-    
-    result = overall_chain.invoke({"text": "  PYTHON IS AWESOME!  "})
-    print(f"Analysis: {result['analysis']}")
+    result = CLEAN_ANALYZE_CHAIN.invoke({"text": "  PYTHON IS AWESOME!  "})
+    print(f"Analysis: {result}")
 
 
 # ============================================================================
@@ -255,7 +267,12 @@ def example_10_conversation_chain():
     """ConversationChain with memory"""
     print("\n=== Example 10: ConversationChain with Memory ===")
     
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
+    # The legacy chain/memory classes are only imported when this example
+    # runs, so the rest of the lesson starts without loading them
+    from langchain.chains import ConversationChain
+    from langchain.memory import ConversationBufferMemory
+    
+    llm = get_llm()
     
     # Initialize memory
     memory = ConversationBufferMemory()
@@ -284,156 +301,206 @@ def example_10_conversation_chain():
 # PART 5: CUSTOM LCEL PATTERNS
 # ============================================================================
 
+LIST_PROMPT = PromptTemplate.from_template("List 3 {category}")
+
+
+def format_list(text: str) -> dict:
+    """Custom function to process output: check-mark the first 3 items"""
+    # Stop after the first 3 non-empty lines instead of scanning the rest
+    lines = islice(filter(None, map(str.strip, text.splitlines())), 3)
+    return {"formatted": "\n".join(f"✓ {line}" for line in lines)}
+
+
+FORMATTED_LIST_CHAIN = (
+    LIST_PROMPT 
+    | get_llm(SMALL_MODEL) 
+    | StrOutputParser() 
+    | format_list
+)
+
+
 def example_11_lcel_with_custom_logic():
     """LCEL with custom Python functions inline"""
     print("\n=== Example 11: LCEL with Custom Logic ===")
     
-    prompt = PromptTemplate(
-        template="List 3 {category}",
-        input_variables=["category"]
-    )
-    
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Custom function to process output
-    def format_list(text: str) -> dict:
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        return {"formatted": "\n".join(f"✓ {line}" for line in lines[:3])}
+    result = FORMATTED_LIST_CHAIN.invoke({"category": "programming languages"})
+    print(f"Formatted List:\n{result['formatted']}")
+
+
+# Both prompts start with the same "Analyze {topic}. First, list " text and
+# only differ in the last word, so the server can reuse the prompt prefix it
+# already processed for the first request when it handles the second one.
+PROS_PROMPT = PromptTemplate.from_template("Analyze {topic}. First, list pros:")
+CONS_PROMPT = PromptTemplate.from_template("Analyze {topic}. First, list cons:")
+
+
+class TopicCache:
+    """Reuse results for topics that mean the same thing ("WFH" vs "working from home")"""
     
-    chain = (
-        prompt 
-        | llm 
-        | StrOutputParser() 
-        | format_list
-    )
+    def __init__(self, embeddings, threshold=0.9):
+        self.embeddings = embeddings
+        self.threshold = threshold  # Minimum cosine similarity for a hit
+        self.entries = []  # (unit-length topic embedding, result)
+        self.hits = 0
     
-    result = chain.invoke({"category": "programming languages"})
-    print(f"Formatted List:\n{result['formatted']}")
+    async def aget(self, topic, compute):
+        """Return the cached result for a similar topic, or await compute(topic)"""
+        vector = await self.embeddings.aembed_query(topic)
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        vector = [v / norm for v in vector]
+        
+        for cached_vector, result in self.entries:
+            similarity = sum(a * b for a, b in zip(vector, cached_vector))
+            if similarity >= self.threshold:
+                self.hits += 1
+                return result
+        
+        result = await compute(topic)
+        self.entries.append((vector, result))
+        return result
 
 
 def example_12_lcel_parallel_chains():
     """Run multiple chains and combine results"""
     print("\n=== Example 12: LCEL Parallel Chains ===")
     
-    from langchain_core.runnables import RunnableParallel
+    llm = get_llm(SMALL_MODEL)
     
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Define prompts
-    prompt1 = PromptTemplate(
-        template="What are pros of {topic}?",
-        input_variables=["topic"]
-    )
+    async def pros_and_cons(topic):
+        # Send both prompts as one batch so they are in flight together.
+        # Ollama only generates them side by side if the server was started
+        # with OLLAMA_NUM_PARALLEL >= 2; otherwise it queues them.
+        prompts = [PROS_PROMPT.format(topic=topic), CONS_PROMPT.format(topic=topic)]
+        pros, cons = await llm.abatch(prompts, config={"max_concurrency": 2})
+        return {"pros": pros, "cons": cons}
     
-    prompt2 = PromptTemplate(
-        template="What are cons of {topic}?",
-        input_variables=["topic"]
-    )
+    # Differently worded topics that ask for the same analysis
+    topics = ["remote work", "working from home", "WFH"]
     
-    # Create parallel chains
-    chain = RunnableParallel({
-        "pros": prompt1 | llm | StrOutputParser(),
-        "cons": prompt2 | llm | StrOutputParser()
-    })
+    async def run(topics):
+        # Needs `ollama pull nomic-embed-text`
+        cache = TopicCache(OllamaEmbeddings(model="nomic-embed-text"))
+        results = []
+        # One topic at a time, so later wordings can hit earlier results
+        for topic in topics:
+            hits_before = cache.hits
+            result = await cache.aget(topic, pros_and_cons)
+            results.append((topic, result, cache.hits > hits_before))
+        return results
     
-    result = chain.invoke({"topic": "remote work"})
-    print(f"Pros: {result['pros']}\n")
-    print(f"Cons: {result['cons']}")
+    for topic, result, cached in asyncio.run(run(topics)):
+        print(f"\n🔎 Topic: {topic} (from {'cache' if cached else 'model'})")
+        print(f"Pros: {result['pros']}\n")
+        print(f"Cons: {result['cons']}")
 
 
 # ============================================================================
 # PART 6: REAL-WORLD EXAMPLES
 # ============================================================================
 
+# Step 1: Generate outline, Step 2: Write content, Step 3: Add title
+OUTLINE_PROMPT = PromptTemplate.from_template("Create a brief outline for an article about {topic}")
+ARTICLE_PROMPT = PromptTemplate.from_template("Write a short article based on this outline:\n{outline}")
+TITLE_PROMPT = PromptTemplate.from_template("Generate a catchy title for this article:\n{article}")
+
+# Build pipeline: one dict that each step extends with its own key
+# (topic -> outline -> article -> title)
+CONTENT_PIPELINE = (
+    RunnablePassthrough.assign(outline=OUTLINE_PROMPT | get_llm() | StrOutputParser())
+    .assign(article=ARTICLE_PROMPT | get_llm() | StrOutputParser())
+    .assign(title=TITLE_PROMPT | get_llm() | StrOutputParser())
+)
+
+
 def example_13_content_pipeline():
     """Real-world: Content creation pipeline"""
     print("\n=== Example 13: Content Creation Pipeline ===")
     
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
-    
-    # Step 1: Generate outline
-    outline_prompt = PromptTemplate(
-        template="Create a brief outline for an article about {topic}",
-        input_variables=["topic"]
-    )
-    
-    # Step 2: Write content
-    content_prompt = PromptTemplate(
-        template="Write a short article based on this outline:\n{outline}",
-        input_variables=["outline"]
-    )
-    
-    # Step 3: Add title
-    title_prompt = PromptTemplate(
-        template="Generate a catchy title for this article:\n{article}",
-        input_variables=["article"]
-    )
-    
-    # Build pipeline
-    pipeline = (
-        outline_prompt
-        | llm
-        | StrOutputParser()
-        | (lambda outline: {"outline": outline})
-        | content_prompt
-        | llm
-        | StrOutputParser()
-        | (lambda article: {"article": article})
-        | title_prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    result = pipeline.invoke({"topic": "benefits of learning Python"})
-    print(f"Generated Title: {result}")
+    # The outline and article stages still need their full text before the
+    # next prompt can be built, but the title streams as it is generated
+    print("Generated Title: ", end="", flush=True)
+    chunks = CONTENT_PIPELINE.stream({"topic": "benefits of learning Python"})
+    write_stream(chunk["title"] for chunk in chunks if "title" in chunk)
+    print()
+
+
+DATA_ANALYSIS_PROMPT = PromptTemplate.from_template("Analyze this data and provide insights: {cleaned_data}")
+INSIGHT_SUMMARY_PROMPT = PromptTemplate.from_template("Summarize these insights in one sentence: {analysis}")
+
+
+def clean_data(inputs: dict) -> str:
+    """Simulate data cleaning"""
+    # split()/join() collapse every whitespace run in one C-level pass
+    return " ".join(inputs["raw_data"].split())
+
+
+# Complete workflow: each assign step adds one key to the same dict
+# (raw_data -> cleaned_data -> analysis -> summary). Every step needs
+# the one before it, so the speedup comes from batching many records.
+ANALYSIS_WORKFLOW = (
+    RunnablePassthrough.assign(cleaned_data=RunnableLambda(clean_data))
+    .assign(analysis=DATA_ANALYSIS_PROMPT | get_llm() | StrOutputParser())
+    .assign(summary=INSIGHT_SUMMARY_PROMPT | get_llm() | StrOutputParser())
+)
 
 
 def example_14_analysis_workflow():
     """Real-world: Data analysis workflow"""
     print("\n=== Example 14: Analysis Workflow ===")
     
-    llm = OllamaLLM(model="llama3.2", temperature=0.7)
+    records = [
+        {"raw_data": "  Sales increased by 25% in Q3  "},
+        {"raw_data": "  Customer  churn dropped to 4% after the new onboarding  "},
+    ]
     
-    # Simulate data cleaning
-    def clean_data(inputs: dict) -> dict:
-        data = inputs["raw_data"].strip().replace("  ", " ")
-        return {"cleaned_data": data}
-    
-    clean_chain = TransformChain(
-        input_variables=["raw_data"],
-        output_variables=["cleaned_data"],
-        transform=clean_data
-    )
-    
-    # Analyze
-    analysis_prompt = PromptTemplate(
-        template="Analyze this data and provide insights: {cleaned_data}",
-        input_variables=["cleaned_data"]
-    )
-    analysis_chain = LLMChain(llm=llm, prompt=analysis_prompt, output_key="analysis")
-    
-    # Summarize
-    summary_prompt = PromptTemplate(
-        template="Summarize these insights in one sentence: {analysis}",
-        input_variables=["analysis"]
-    )
-    summary_chain = LLMChain(llm=llm, prompt=summary_prompt, output_key="summary")
-    
-    # Complete workflow
-    workflow = SequentialChain(
-        chains=[clean_chain, analysis_chain, summary_chain],
-        input_variables=["raw_data"],
-        output_variables=["cleaned_data", "analysis", "summary"]
-    )
-    
-    result = workflow.invoke({"raw_data": "  Sales increased by 25% in Q3  "})
-    print(f"Summary: {result['summary']}")
+    # Run all records through the workflow concurrently
+    results = ANALYSIS_WORKFLOW.batch(records, config={"max_concurrency": 16})
+    for result in results:
+        print(f"Data: {result['cleaned_data']}")
+        print(f"Summary: {result['summary']}\n")
 
 
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 
+CHECKPOINT_FILE = "lesson5_progress.jsonl"
+
+
+def run_with_checkpoint(examples_to_run, output_jsonl=CHECKPOINT_FILE):
+    """Run examples in order, skipping the ones a failed run already finished.
+    
+    The first line of output_jsonl lists the selected examples and each
+    finished example is appended right away, so after a crash or Ctrl-C the
+    next run of the same selection picks up where it stopped. The file is
+    deleted once every selected example succeeds, and ignored if the
+    selection changed.
+    """
+    selected = [fn.__name__ for fn in examples_to_run]
+    done = set()
+    if os.path.exists(output_jsonl):
+        with open(output_jsonl) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if lines and lines[0].get("selected") == selected:
+            done = {line["name"] for line in lines[1:]}
+    
+    with open(output_jsonl, "a" if done else "w") as f:
+        if not done:
+            json.dump({"selected": selected}, f)
+            f.write("\n")
+        for fn in examples_to_run:
+            if fn.__name__ in done:
+                print(f"\n⏭️  Skipping {fn.__name__} (finished before the last run stopped)")
+                continue
+            fn()
+            json.dump({"name": fn.__name__, "ts": time.time()}, f)
+            f.write("\n")
+            f.flush()
+    
+    # Everything ran: the next run starts from the beginning again
+    os.remove(output_jsonl)
+
+
 def main():
     """Run all examples"""
     print("=" * 70)
@@ -441,32 +508,34 @@ def main():
     print("=" * 70)
     
     # Uncomment the examples you want to run
-    
-    # LCEL - Modern Approach
-    example_1_basic_lcel()
-    # example_2_multi_step_lcel()
-    # example_3_lcel_with_streaming()
-    # example_4_lcel_with_json_parser()
-    
-    # Legacy Chains
-    # example_5_llm_chain()
-    # example_6_simple_sequential_chain()
-    # example_7_sequential_chain()
-    
-    # Transform Chains
-    # example_8_transform_chain()
-    # example_9_transform_with_llm()
-    
-    # Memory & Conversation
-    # example_10_conversation_chain()
-    
-    # Advanced LCEL
-    # example_11_lcel_with_custom_logic()
-    # example_12_lcel_parallel_chains()
-    
-    # Real-world Examples
-    # example_13_content_pipeline()
-    # example_14_analysis_workflow()
+    examples_to_run = [
+        # LCEL - Modern Approach
+        example_1_basic_lcel,
+        # example_2_multi_step_lcel,
+        # example_3_lcel_with_streaming,
+        # example_4_lcel_with_json_parser,
+        
+        # Sequential Chains (legacy chains rewritten in LCEL)
+        # example_5_llm_chain,
+        # example_6_simple_sequential_chain,
+        # example_7_sequential_chain,
+        
+        # Transforms
+        # example_8_transform_chain,
+        # example_9_transform_with_llm,
+        
+        # Memory & Conversation
+        # example_10_conversation_chain,
+        
+        # Advanced LCEL
+        # example_11_lcel_with_custom_logic,
+        # example_12_lcel_parallel_chains,
+        
+        # Real-world Examples
+        # example_13_content_pipeline,
+        # example_14_analysis_workflow,
+    ]
+    run_with_checkpoint(examples_to_run)
     
     print("\n" + "=" * 70)
     print("Examples completed!")
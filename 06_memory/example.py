@@ -3,28 +3,77 @@ Lesson 6: Memory - Modern Approaches
 Updated to use latest LangChain patterns (2024+)
 """
 
+import asyncio
+import json
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import HumanMessage, SystemMessage, messages_to_dict
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
+from langchain_community.chat_message_histories import FileChatMessageHistory
 
 load_dotenv()
 
 model = os.getenv("model_2")
 llm = ChatOllama(model=model, temperature=0.7)
 
-# Store for multiple conversation sessions
-store = {}
+# Conversation sessions are saved as one JSON file per session, so nothing
+# accumulates in the Python process and chats survive a restart
+HISTORY_DIR = "histories"
+
+# Oldest messages are dropped from a session file beyond this many
+MAX_STORED_MESSAGES = 20
+
+
+class TrimmedFileChatMessageHistory(FileChatMessageHistory):
+    """File-backed chat history that keeps only the newest messages"""
+    
+    def __init__(self, file_path: str, max_messages: int = MAX_STORED_MESSAGES, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self.max_messages = max_messages
+    
+    def add_message(self, message) -> None:
+        messages = (self.messages + [message])[-self.max_messages:]
+        self.file_path.write_text(
+            json.dumps(messages_to_dict(messages), ensure_ascii=self.ensure_ascii),
+            encoding=self.encoding
+        )
 
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """Get or create chat history for a session"""
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-    return store[session_id]
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    return TrimmedFileChatMessageHistory(os.path.join(HISTORY_DIR, f"{session_id}.json"))
+
+
+def start_fresh_sessions(*session_ids):
+    """Empty the demo sessions' files so a rerun doesn't inherit the last run's chat"""
+    for session_id in session_ids:
+        get_session_history(session_id).clear()
+
+
+# How many past messages are sent to the model with each new question. The
+# session file keeps more than this; only the prompt is trimmed, so its
+# size (and Ollama's prefill work) stops growing with every turn.
+MAX_HISTORY_MESSAGES = 8
+
+
+def limit_messages(messages, max_messages=MAX_HISTORY_MESSAGES):
+    """Keep only the last max_messages messages"""
+    return messages[-max_messages:]
+
+
+def with_history_window(chain, max_messages=MAX_HISTORY_MESSAGES):
+    """Trim the injected history before it reaches the prompt"""
+    return RunnablePassthrough.assign(
+        history=lambda x: limit_messages(x["history"], max_messages)
+    ) | chain
 
 
 def example_1_basic_memory():
@@ -41,7 +90,7 @@ def example_1_basic_memory():
     ])
     
     # Create chain with memory
-    chain = prompt | llm | StrOutputParser()
+    chain = with_history_window(prompt | llm | StrOutputParser())
     
     # Wrap chain with message history
     chain_with_history = RunnableWithMessageHistory(
@@ -53,6 +102,7 @@ def example_1_basic_memory():
     
     # Test conversation
     session_id = "user_123"
+    start_fresh_sessions(session_id)
     
     print("\n💬 Conversation 1:")
     response1 = chain_with_history.invoke(
@@ -91,7 +141,7 @@ def example_2_multi_session():
         ("human", "{input}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    chain = with_history_window(prompt | llm | StrOutputParser())
     chain_with_history = RunnableWithMessageHistory(
         chain,
         get_session_history,
@@ -99,38 +149,37 @@ def example_2_multi_session():
         history_messages_key="history"
     )
     
-    # Session 1
-    print("\n👤 User 1 (session_1):")
-    r1 = chain_with_history.invoke(
-        {"input": "I like pizza"},
-        config={"configurable": {"session_id": "session_1"}}
+    sessions = [
+        {"configurable": {"session_id": "session_1"}},
+        {"configurable": {"session_id": "session_2"}},
+    ]
+    start_fresh_sessions("session_1", "session_2")
+    
+    # The two sessions are independent, so each round runs both at once
+    r1, r2 = chain_with_history.batch(
+        [{"input": "I like pizza"}, {"input": "I like sushi"}],
+        config=sessions,
     )
+    
+    print("\n👤 User 1 (session_1):")
     print(f"User: I like pizza")
     print(f"AI: {r1[:100]}...")
     
-    # Session 2
     print("\n👤 User 2 (session_2):")
-    r2 = chain_with_history.invoke(
-        {"input": "I like sushi"},
-        config={"configurable": {"session_id": "session_2"}}
-    )
     print(f"User: I like sushi")
     print(f"AI: {r2[:100]}...")
     
-    # Test memory isolation
+    # Test memory isolation - this round needs the first round's history
     print("\n🧪 Testing Memory Isolation:")
-    print("\nAsking session_1: What do I like?")
-    r3 = chain_with_history.invoke(
-        {"input": "What do I like?"},
-        config={"configurable": {"session_id": "session_1"}}
+    r3, r4 = chain_with_history.batch(
+        [{"input": "What do I like?"}, {"input": "What do I like?"}],
+        config=sessions,
     )
+    
+    print("\nAsking session_1: What do I like?")
     print(f"AI: {r3[:100]}...")
     
     print("\nAsking session_2: What do I like?")
-    r4 = chain_with_history.invoke(
-        {"input": "What do I like?"},
-        config={"configurable": {"session_id": "session_2"}}
-    )
     print(f"AI: {r4[:100]}...")
     
     print()
@@ -142,34 +191,24 @@ def example_3_window_memory():
     print("Example 3: Window Memory (Last 4 Messages)")
     print("=" * 60)
     
-    from langchain_core.runnables import RunnableLambda
-    
-    def limit_messages(messages):
-        """Keep only last 4 messages"""
-        return messages[-4:] if len(messages) > 4 else messages
-    
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant."),
         MessagesPlaceholder(variable_name="history"),
         ("human", "{input}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
-    
-    # Create custom history getter with window
-    def get_windowed_history(session_id: str):
-        history = get_session_history(session_id)
-        # Return limited messages
-        return history
+    # The session file keeps more; the model only sees the last 4 messages
+    chain = with_history_window(prompt | llm | StrOutputParser(), max_messages=4)
     
     chain_with_history = RunnableWithMessageHistory(
         chain,
-        get_windowed_history,
+        get_session_history,
         input_messages_key="input",
         history_messages_key="history"
     )
     
     session_id = "window_test"
+    start_fresh_sessions(session_id)
     
     # Have multiple conversations
     questions = [
@@ -182,18 +221,21 @@ def example_3_window_memory():
     ]
     
     for i, question in enumerate(questions, 1):
-        print(f"\n💬 Turn {i}: {question}")
         response = chain_with_history.invoke(
             {"input": question},
             config={"configurable": {"session_id": session_id}}
         )
-        print(f"AI: {response[:100]}...")
         
-        # Show history size
+        # Show history size; each turn is written to stdout in one go
         history = get_session_history(session_id)
-        print(f"📊 History size: {len(history.messages)} messages")
+        sys.stdout.write(
+            f"\n💬 Turn {i}: {question}\n"
+            f"AI: {response[:100]}...\n"
+            f"📊 History size: {len(history.messages)} messages (model sees last 4)\n"
+        )
     
-    print()
+    sys.stdout.write("\n")
+    sys.stdout.flush()
 
 
 def example_4_chat_with_system():
@@ -209,7 +251,7 @@ def example_4_chat_with_system():
         ("human", "{input}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    chain = with_history_window(prompt | llm | StrOutputParser())
     chain_with_history = RunnableWithMessageHistory(
         chain,
         get_session_history,
@@ -218,6 +260,7 @@ def example_4_chat_with_system():
     )
     
     session_id = "python_tutor"
+    start_fresh_sessions(session_id)
     
     print("\n👨‍🏫 Python Tutor Session:")
     
@@ -258,7 +301,7 @@ def example_5_clear_history():
         ("human", "{input}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    chain = with_history_window(prompt | llm | StrOutputParser())
     chain_with_history = RunnableWithMessageHistory(
         chain,
         get_session_history,
@@ -267,6 +310,7 @@ def example_5_clear_history():
     )
     
     session_id = "clear_test"
+    start_fresh_sessions(session_id)
     
     print("\n💬 First conversation:")
     r1 = chain_with_history.invoke(
@@ -301,54 +345,100 @@ def example_5_clear_history():
     print()
 
 
+# The interactive chat always sends the same shape of prompt, so it is built
+# directly as a message list instead of formatting a ChatPromptTemplate per turn
+CHAT_SYSTEM_MESSAGE = SystemMessage(content="You are a friendly assistant. Keep responses concise.")
+
+
+def format_chat_messages(inputs: dict) -> list:
+    """System message, then the (trimmed) history, then the new question"""
+    return [CHAT_SYSTEM_MESSAGE, *inputs["history"], HumanMessage(content=inputs["input"])]
+
+
+async def read_line(prompt=""):
+    """input() that doesn't block the event loop or Ctrl+C"""
+    # The line is read on a daemon thread and handed back to the loop. Unlike
+    # asyncio.to_thread, nothing waits for a still-pending input() on exit,
+    # so Ctrl+C at the prompt ends the program straight away.
+    loop = asyncio.get_running_loop()
+    line = loop.create_future()
+    
+    def deliver(result, error):
+        if not line.done():
+            line.set_exception(error) if error else line.set_result(result)
+    
+    def read():
+        try:
+            result, error = input(prompt), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(deliver, result, error)
+        except RuntimeError:
+            pass  # The loop already closed
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await line
+
+
 def example_6_interactive_chat():
     """Example 6: Interactive chat loop"""
     print("=" * 60)
     print("Example 6: Interactive Chat")
     print("=" * 60)
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a friendly assistant. Keep responses concise."),
-        MessagesPlaceholder(variable_name="history"),
-        ("human", "{input}")
-    ])
-    
-    chain = prompt | llm | StrOutputParser()
-    chain_with_history = RunnableWithMessageHistory(
-        chain,
-        get_session_history,
-        input_messages_key="input",
-        history_messages_key="history"
-    )
-    
     session_id = "interactive_chat"
     
+    async def chat_loop():
+        # Created inside the running event loop: its async HTTP connections
+        # belong to this loop, so the example can be started again from the menu
+        chat_llm = ChatOllama(model=model, temperature=0.7)
+        chain = with_history_window(
+            RunnableLambda(format_chat_messages) | chat_llm | StrOutputParser()
+        )
+        chain_with_history = RunnableWithMessageHistory(
+            chain,
+            get_session_history,
+            input_messages_key="input",
+            history_messages_key="history"
+        )
+        
+        while True:
+            # Waiting for the keyboard doesn't block the event loop
+            user_input = (await read_line("\nYou: ")).strip()
+            
+            if user_input.lower() in ['exit', 'quit', 'q']:
+                print("👋 Goodbye!")
+                break
+            
+            if user_input.lower() == 'clear':
+                get_session_history(session_id).clear()
+                print("🗑️ History cleared!")
+                continue
+            
+            if not user_input:
+                continue
+            
+            try:
+                # Show the reply as it is generated; the turn is saved to the
+                # history once the stream finishes. Each chunk is flushed, as
+                # a terminal would otherwise only show text at line ends.
+                sys.stdout.write("AI: ")
+                async for chunk in chain_with_history.astream(
+                    {"input": user_input},
+                    config={"configurable": {"session_id": session_id}}
+                ):
+                    sys.stdout.write(chunk)
+                    sys.stdout.flush()
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+            except Exception as e:
+                print(f"\n❌ Error: {e}")
+    
     print("\n💬 Chat started! (type 'exit' to quit, 'clear' to reset)")
     print("-" * 60)
     
-    while True:
-        user_input = input("\nYou: ").strip()
-        
-        if user_input.lower() in ['exit', 'quit', 'q']:
-            print("👋 Goodbye!")
-            break
-        
-        if user_input.lower() == 'clear':
-            get_session_history(session_id).clear()
-            print("🗑️ History cleared!")
-            continue
-        
-        if not user_input:
-            continue
-        
-        try:
-            response = chain_with_history.invoke(
-                {"input": user_input},
-                config={"configurable": {"session_id": session_id}}
-            )
-            print(f"AI: {response}")
-        except Exception as e:
-            print(f"❌ Error: {e}")
+    asyncio.run(chat_loop())
     
     print()
 
@@ -3,55 +3,199 @@ Lesson 7: Agents Basics
 Creating and using AI agents
 """
 
+import ast
+import math
+import operator
 import os
+import sys
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import create_react_agent
+from langchain_core.messages import AIMessageChunk
 from langchain_core.tools import tool
 from langchain_ollama import ChatOllama
 
 load_dotenv()
 
+# The default llama3.1:8b tag is already the 4-bit (Q4_K_M) build: half the
+# bytes of Q8 to read per generated token, so decoding stays fast on
+# memory-bound CPUs and consumer GPUs. Avoid the larger q8_0/fp16 tags here.
 llm = ChatOllama(
     model="llama3.1:8b",
     temperature=0,
-    num_ctx=2048,
-    num_predict=512
+    # Short tool questions fit easily; half the KV-cache memory of 2048
+    num_ctx=1024,
+    num_predict=512,
+    # Keep the model (and its cached prompt prefix) loaded between examples
+    keep_alive=-1
 )
 
+
+def warm_up_model(chat_model):
+    """Load the model in a background thread so it is ready by the first question"""
+    # One generated token is enough to load the weights; num_predict is not a
+    # load option, so the loaded model is the one the examples use
+    warm_up = chat_model.model_copy(update={"num_predict": 1})
+    threading.Thread(target=warm_up.invoke, args=("Hi",), daemon=True).start()
+
+
+warm_up_model(llm)
+
+# The agent's tool node already runs all tool calls from one model message at
+# the same time; this asks the model to send independent calls together, so a
+# multi-tool question costs one model round trip instead of one per tool
+PARALLEL_TOOLS_PROMPT = (
+    "You can call several tools at once. When a question needs tool results "
+    "that don't depend on each other, request all of those tool calls in the "
+    "same step. Only wait for a result when the next call needs it."
+)
+
+# Compiled agents, one per (tool names, prompt, memory)
+agent_cache = {}
+
+
+def get_agent(tools, prompt=None, memory=False):
+    """Build the agent graph for a set of tools once and reuse it afterwards"""
+    # Same tools in the same order: the tool schemas at the start of every
+    # prompt are byte-identical, so Ollama can reuse its cached prefix
+    tools = sorted(tools, key=lambda t: t.name)
+    key = (tuple(t.name for t in tools), prompt, memory)
+    if key not in agent_cache:
+        # With a checkpointer the agent keeps each thread's messages itself
+        checkpointer = MemorySaver() if memory else None
+        agent_cache[key] = create_react_agent(llm, tools, prompt=prompt, checkpointer=checkpointer)
+    return agent_cache[key]
+
+
+def stream_answer(agent_executor, inputs, config=None) -> str:
+    """Print the agent's reply token by token and return the final answer"""
+    answer = []
+    step = None
+    for chunk, metadata in agent_executor.stream(inputs, config, stream_mode="messages"):
+        # Only model output; tool results are streamed as messages too
+        if metadata.get("langgraph_node") != "agent" or not isinstance(chunk, AIMessageChunk):
+            continue
+        # Each model step starts a new answer; the last step is the final one
+        if metadata.get("langgraph_step") != step:
+            step = metadata.get("langgraph_step")
+            answer = []
+        if chunk.content:
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+            answer.append(chunk.content)
+    print()
+    return "".join(answer)
+
+
+# Safe math evaluation for the calculator tools: only numbers, arithmetic
+# operators and a few functions are allowed, unlike eval()
+SAFE_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+SAFE_FUNCTIONS = {"abs": abs, "round": round, "min": min, "max": max, "sqrt": math.sqrt}
+MAX_EXPONENT = 1000
+MAX_POWER_BITS = 10_000  # Largest power result, so nested powers can't grow without bound
+
+
+@lru_cache(maxsize=256)
+def parse_expression(expression: str) -> ast.expr:
+    """Parse once; repeated expressions reuse the cached tree"""
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def eval_node(node):
+    """Evaluate a parsed math expression"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in SAFE_OPERATORS:
+        left, right = eval_node(node.left), eval_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > MAX_EXPONENT:
+                raise ValueError(f"Exponent too large (max {MAX_EXPONENT})")
+            # The exponent alone doesn't bound ((9**999)**999)**999: check
+            # the size of the result before computing it
+            if abs(left) > 1 and abs(right) * math.log2(abs(left)) > MAX_POWER_BITS:
+                raise ValueError(f"Result too large (max {MAX_POWER_BITS} bits)")
+        return SAFE_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in SAFE_OPERATORS:
+        return SAFE_OPERATORS[type(node.op)](eval_node(node.operand))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in SAFE_FUNCTIONS and not node.keywords):
+        return SAFE_FUNCTIONS[node.func.id](*(eval_node(arg) for arg in node.args))
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+
+
+def safe_eval(expression: str):
+    """Evaluate a math expression like '(10 + 5) * 2' without eval()"""
+    return eval_node(parse_expression(expression))
+
+
+# Example 1 tools: simple tools using @tool decorator
+@tool
+def get_word_length(word: str) -> int:
+    """Returns the length of a word. Input should be a single word."""
+    return len(word)
+
+
+@tool
+def reverse_string(text: str) -> str:
+    """Reverses a string. Input should be a string to reverse."""
+    return text[::-1]
+
+
 def example_1_simple_agent():
     """Example 1: Creating a simple agent with basic tools"""
     print("=" * 50)
     print("Example 1: Simple Agent with Tools")
     print("=" * 50)
-   
-    # Define simple tools using @tool decorator
-    @tool
-    def get_word_length(word: str) -> int:
-        """Returns the length of a word. Input should be a single word."""
-        return len(word)
-    
-    @tool
-    def reverse_string(text: str) -> str:
-        """Reverses a string. Input should be a string to reverse."""
-        return text[::-1]
     
     # Create tool list
     tools = [get_word_length, reverse_string]
         
     # Create agent executor using LangGraph (modern approach)
-    agent_executor = create_react_agent(llm, tools)
+    agent_executor = get_agent(tools)
     
     # Test the agent
     print("\n🤖 Agent Task:\n")
     
     prompt = input("Ask to use the string tools: ")
-    result = agent_executor.invoke({
+    
+    # Show the answer as it is generated
+    print("\n✅ Final Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", prompt)]
     })
-    
-    # Extract final answer from messages
-    final_message = result["messages"][-1]
-    print(f"\n✅ Final Answer: {final_message.content}\n")
+    print()
+
+
+# Example 2 tool: calculator function with better description
+@tool
+def calculator(expression: str) -> str:
+    """Useful for evaluating mathematical expressions. 
+    Input should be a valid Python mathematical expression like:
+    - '2 + 2' for addition
+    - '10 * 5' for multiplication  
+    - '100 / 4' for division
+    - '2 ** 3' for exponentiation
+    Examples: '85000 * 0.5 / 100' or '(10 + 5) * 2'
+    """
+    try:
+        # Safely evaluate the mathematical expression
+        result = safe_eval(expression)
+        return str(result)
+    except Exception as e:
+        return f"Error: {str(e)}"
+
 
 def example_2_calculator_agent():
     """Example 2: Agent with calculator tool"""
@@ -59,41 +203,51 @@ def example_2_calculator_agent():
     print("Example 2: Calculator Agent")
     print("=" * 50)
     
-    # Simple calculator function with better description
-    @tool
-    def calculator(expression: str) -> str:
-        """Useful for evaluating mathematical expressions. 
-        Input should be a valid Python mathematical expression like:
-        - '2 + 2' for addition
-        - '10 * 5' for multiplication  
-        - '100 / 4' for division
-        - '2 ** 3' for exponentiation
-        Examples: '85000 * 0.5 / 100' or '(10 + 5) * 2'
-        """
-        try:
-            # Safely evaluate the mathematical expression
-            result = eval(expression, {"__builtins__": {}}, {})
-            return str(result)
-        except Exception as e:
-            return f"Error: {str(e)}"
-
     tools = [calculator]
 
     # Use create_react_agent (modern approach)
-    agent_executor = create_react_agent(llm, tools)
+    agent_executor = get_agent(tools)
 
     user_prompt = input("Enter a math question for the agent: ")
 
     print(f"\n🤖 Agent Task: {user_prompt}")
     
-    result = agent_executor.invoke({
+    # Show the answer as it is generated
+    print("\n✅ Final Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", user_prompt)]
     })
+    print()
+
+
+# Example 3 tools: various different tools
+@tool
+def get_length(text: str) -> int:
+    """Returns the length of text. Input should be a string."""
+    return len(text)
+
+
+@tool
+def to_uppercase(text: str) -> str:
+    """Converts text to uppercase. Input should be a string."""
+    return text.upper()
+
 
-    # Extract final answer from messages
-    final_message = result["messages"][-1]
-    final_message = result.content
-    print(f"\n✅ Final Answer: {final_message}\n")
+@tool
+def count_words(text: str) -> int:
+    """Counts the number of words in text. Input should be a string."""
+    return len(text.split())
+
+
+@tool
+def multiply_numbers(input_str: str) -> str:
+    """Multiplies two numbers. Input format: 'num1,num2' where num1 and num2 are numbers."""
+    try:
+        nums = input_str.split(',')
+        result = float(nums[0].strip()) * float(nums[1].strip())
+        return str(result)
+    except Exception as e:
+        return f"Error: Please provide two numbers separated by comma. Error: {str(e)}"
 
 
 def example_3_multi_tool_agent():
@@ -102,47 +256,36 @@ def example_3_multi_tool_agent():
     print("Example 3: Multi-Tool Agent")
     print("=" * 50)
     
-    # Define various tools
-    @tool
-    def get_length(text: str) -> int:
-        """Returns the length of text. Input should be a string."""
-        return len(text)
-    
-    @tool
-    def to_uppercase(text: str) -> str:
-        """Converts text to uppercase. Input should be a string."""
-        return text.upper()
-    
-    @tool
-    def count_words(text: str) -> int:
-        """Counts the number of words in text. Input should be a string."""
-        return len(text.split())
-    
-    @tool
-    def multiply_numbers(input_str: str) -> str:
-        """Multiplies two numbers. Input format: 'num1,num2' where num1 and num2 are numbers."""
-        try:
-            nums = input_str.split(',')
-            result = float(nums[0].strip()) * float(nums[1].strip())
-            return str(result)
-        except Exception as e:
-            return f"Error: Please provide two numbers separated by comma. Error: {str(e)}"
-
     tools = [get_length, to_uppercase, count_words, multiply_numbers]
 
     # Create agent using LangGraph
-    agent_executor = create_react_agent(llm, tools)
+    agent_executor = get_agent(tools, prompt=PARALLEL_TOOLS_PROMPT)
        
     # Complex task requiring multiple tools
     print("\n🤖 Agent Task: Complex multi-step problem")
-    result = agent_executor.invoke({
+    print("\n✅ Final Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", "Take the text 'Hello World', count how many words it has, "
                      "then multiply that number by 5. What's the result?")]
     })
-    
-    # Extract final answer from messages
-    final_message = result["messages"][-1]
-    print(f"\n✅ Final Answer: {final_message.content}\n")
+    print()
+
+
+# Example 4 tools
+@tool
+def get_current_year() -> str:
+    """Returns the current year (2025)."""
+    return "2025"
+
+
+@tool
+def calculate(expression: str) -> str:
+    """Calculates a mathematical expression. Input should be a valid Python expression."""
+    try:
+        result = safe_eval(expression)
+        return str(result)
+    except Exception as e:
+        return f"Error in calculation: {str(e)}"
 
 
 def example_4_agent_with_memory():
@@ -150,46 +293,40 @@ def example_4_agent_with_memory():
     print("=" * 50)
     print("Example 4: Agent with Memory")
     print("=" * 50)
-       
-    @tool
-    def get_current_year() -> str:
-        """Returns the current year (2025)."""
-        return "2025"
-    
-    @tool
-    def calculate(expression: str) -> str:
-        """Calculates a mathematical expression. Input should be a valid Python expression."""
-        try:
-            result = eval(expression, {"__builtins__": {}}, {})
-            return str(result)
-        except Exception as e:
-            return f"Error in calculation: {str(e)}"
     
     tools = [get_current_year, calculate]
     
-    # Create agent with LangGraph (memory is built-in via message history)
-    agent_executor = create_react_agent(llm, tools)
+    # Create agent with LangGraph; the checkpointer stores the conversation
+    agent_executor = get_agent(tools, memory=True)
+    # Every call with this thread_id continues the same conversation
+    config = {"configurable": {"thread_id": "example_4"}}
     
     # First interaction
     print("\n🤖 First question:")
-    result1 = agent_executor.invoke({
+    print("Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", "What year is it?")]
-    })
-    answer1 = result1["messages"][-1].content
-    print(f"Answer: {answer1}")
+    }, config)
     
-    # Second interaction - agent maintains context via message history
+    # Second interaction - only the new message is sent; the earlier turn
+    # (tool calls included) comes from the checkpoint, in the same order, so
+    # the prompt prefix matches the previous request
     print("\n🤖 Follow-up question (testing memory):")
-    # Include previous messages for context
-    result2 = agent_executor.invoke({
-        "messages": [
-            ("human", "What year is it?"),
-            ("assistant", answer1),
-            ("human", "What will the year be in 5 years?")
-        ]
-    })
-    answer2 = result2["messages"][-1].content
-    print(f"Answer: {answer2}\n")
+    print("Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
+        "messages": [("human", "What will the year be in 5 years?")]
+    }, config)
+    print()
+
+
+# Example 5 tool
+@tool
+def risky_operation(input_str: str) -> str:
+    """A tool that processes input but may fail on certain inputs. 
+    Input should be a string to process."""
+    if "error" in input_str.lower():
+        raise ValueError("Intentional error for demonstration")
+    return f"Success: Processed '{input_str}'"
 
 
 def example_5_agent_error_handling():
@@ -198,38 +335,28 @@ def example_5_agent_error_handling():
     print("Example 5: Agent Error Handling")
     print("=" * 50)
     
-    @tool
-    def risky_operation(input_str: str) -> str:
-        """A tool that processes input but may fail on certain inputs. 
-        Input should be a string to process."""
-        if "error" in input_str.lower():
-            raise ValueError("Intentional error for demonstration")
-        return f"Success: Processed '{input_str}'"
-    
     tools = [risky_operation]
     
     # Create agent with LangGraph
-    agent_executor = create_react_agent(llm, tools)
+    agent_executor = get_agent(tools)
     
     print("\n🤖 Test 1: Normal operation")
     try:
-        result = agent_executor.invoke({
+        print("✅ Result: ", end="", flush=True)
+        stream_answer(agent_executor, {
             "messages": [("human", "Use the risky_operation tool with the text 'hello'")]
         })
-        final_message = result["messages"][-1]
-        print(f"✅ Result: {final_message.content}")
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        print(f"\n❌ Error: {str(e)}")
     
     print("\n🤖 Test 2: Triggering error")
     try:
-        result = agent_executor.invoke({
+        print("✅ Result: ", end="", flush=True)
+        stream_answer(agent_executor, {
             "messages": [("human", "Use the risky_operation tool with the text 'error'")]
         })
-        final_message = result["messages"][-1]
-        print(f"✅ Result: {final_message.content}")
     except Exception as e:
-        print(f"❌ Error handled: {str(e)[:100]}")
+        print(f"\n❌ Error handled: {str(e)[:100]}")
     
     print()
 
@@ -2,105 +2,280 @@
 Lesson 8: Tools and Toolkits
 """
 
+import asyncio
+import math
 import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from math import isqrt
 from dotenv import load_dotenv
-import requests
-from langchain_ollama import ChatOllama
+import httpx
+import numpy as np
+from langchain_ollama import ChatOllama, OllamaEmbeddings
 from langgraph.prebuilt import create_react_agent
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.tools import tool
 
 load_dotenv()
 
+# Set model_2 to a 4-bit tag (e.g. llama3.1:8b-instruct-q4_K_M) for faster
+# decoding: half the weight bytes of Q8 are read per generated token
 model = os.getenv("model_2")
 
+# A 1024-token context is plenty for the short tool questions and needs half
+# the KV-cache memory of 2048
 llm = ChatOllama(
+    model=model,
+    temperature=0,
+    num_ctx=1024,
+    num_predict=512,
+    # Keep the model (and its cached prompt prefix) loaded between examples
+    keep_alive=-1
+)
+
+# The user API tools return whole user records, which need the larger context.
+# Ollama reloads the model when num_ctx changes, so an example sticks to one
+# of the two instead of switching per call.
+llm_long_context = ChatOllama(
     model=model,
     temperature=0,
     num_ctx=2048,
-    num_predict=512
+    num_predict=512,
+    keep_alive=-1
 )
 
 
+def warm_up_model(chat_model):
+    """Load the model in a background thread so it is ready by the first question"""
+    # One generated token is enough to load the weights; num_predict is not a
+    # load option, so the loaded model is the one the examples use
+    warm_up = chat_model.model_copy(update={"num_predict": 1})
+    threading.Thread(target=warm_up.invoke, args=("Hi",), daemon=True).start()
+
+
+# Most examples use the 1024-token context
+if model:
+    warm_up_model(llm)
+
+# The agent's tool node already runs all tool calls from one model message at
+# the same time; this asks the model to send independent calls together, so a
+# multi-tool question costs one model round trip instead of one per tool
+PARALLEL_TOOLS_PROMPT = (
+    "You can call several tools at once. When a question needs tool results "
+    "that don't depend on each other, request all of those tool calls in the "
+    "same step. Only wait for a result when the next call needs it."
+)
+
+# A question's first model step only has to emit tool calls, which are short
+# even when several are sent together; the full num_predict is kept for the
+# step that answers from the tool results. num_predict is a per-request
+# option, so both caps share the same loaded model. Agents that take free-form
+# questions turn the cap off: the model may answer those without any tools,
+# and a capped step would cut that answer short.
+TOOL_CALL_MAX_TOKENS = 128
+
+# Compiled agents, one per (tool names, prompt, context size)
+agent_cache = {}
+
+
+def get_agent(tools, prompt=None, long_context=False, cap_tool_calls=True):
+    """Build the agent graph for a set of tools once and reuse it afterwards"""
+    # Same tools in the same order: the tool schemas at the start of every
+    # prompt are byte-identical, so Ollama can reuse its cached prefix
+    tools = sorted(tools, key=lambda t: t.name)
+    key = (tuple(t.name for t in tools), prompt, long_context, cap_tool_calls)
+    if key not in agent_cache:
+        chat_model = llm_long_context if long_context else llm
+        if cap_tool_calls:
+            tool_call_model = chat_model.model_copy(
+                update={"num_predict": TOOL_CALL_MAX_TOKENS}
+            ).bind_tools(tools)
+            answer_model = chat_model.bind_tools(tools)
+
+            def select_model(state, runtime):
+                # Tool results in the conversation mean the answer comes next
+                last_message = state["messages"][-1]
+                return answer_model if isinstance(last_message, ToolMessage) else tool_call_model
+        else:
+            select_model = chat_model
+
+        agent_cache[key] = create_react_agent(select_model, tools, prompt=prompt)
+    return agent_cache[key]
+
+
+def stream_answer(agent_executor, inputs) -> str:
+    """Print the agent's reply token by token and return the final answer"""
+    answer = []
+    step = None
+    for chunk, metadata in agent_executor.stream(inputs, stream_mode="messages"):
+        # Only model output; tool results are streamed as messages too
+        if metadata.get("langgraph_node") != "agent" or not isinstance(chunk, AIMessageChunk):
+            continue
+        # Each model step starts a new answer; the last step is the final one
+        if metadata.get("langgraph_step") != step:
+            step = metadata.get("langgraph_step")
+            answer = []
+        if chunk.content:
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+            answer.append(chunk.content)
+    print()
+    return "".join(answer)
+
+
+# Semantic answer cache: a question that means the same as an earlier one
+# (for the same tools and system prompt) is answered without running the agent
+embeddings = OllamaEmbeddings(model="nomic-embed-text")
+SIMILARITY_THRESHOLD = 0.95
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+response_cache = {}  # (tool names, system prompt) -> [(unit vector, numbers, answer)]
+
+
+def ask_agent(tools, question, system=None) -> str:
+    """Stream the agent's answer, or print a cached answer to a similar question"""
+    key = (tuple(sorted(t.name for t in tools)), system)
+    vector = embeddings.embed_query(question)
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    vector = [v / norm for v in vector]
+    # "Analyze: 17" and "Analyze: 71" embed almost the same, so the numbers
+    # in the question have to match exactly as well
+    numbers = NUMBER_PATTERN.findall(question)
+    
+    for cached_vector, cached_numbers, answer in response_cache.get(key, []):
+        similarity = sum(a * b for a, b in zip(vector, cached_vector))
+        if similarity >= SIMILARITY_THRESHOLD and cached_numbers == numbers:
+            print(f"{answer}\n⚡ (cached answer, similarity {similarity:.2f})")
+            return answer
+    
+    messages = [("system", system)] if system else []
+    messages.append(("human", question))
+    # The system prompt may tell the model to answer without tools
+    answer = stream_answer(get_agent(tools, cap_tool_calls=False), {"messages": messages})
+    response_cache.setdefault(key, []).append((vector, numbers, answer))
+    return answer
+
+
+# Example 1 tools: better tool definitions with clear descriptions
+def parse_two_numbers(input_str):
+    """Parse "a,b" into two floats, raising ValueError with a hint for the agent."""
+    parts = input_str.split(",")
+    if len(parts) != 2:
+        raise ValueError("Please provide exactly two numbers separated by a comma (e.g., '34,45')")
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        raise ValueError("Please provide valid numbers (e.g., '34,45')") from None
+
+
+@tool
+def add_numbers(input_str: str) -> str:
+    """Add two numbers together.
+
+    This tool adds two numbers and returns the sum.
+
+    Args:
+        input_str: Two numbers separated by a comma (e.g., "34,45" or "5.5,3.2")
+
+    Returns:
+        A string with the sum of the two numbers
+
+    Examples:
+        - Input: "34,45" -> Output: "The sum is 79.0"
+        - Input: "10,20" -> Output: "The sum is 30.0"
+    """
+    try:
+        a, b = parse_two_numbers(input_str)
+    except ValueError as e:
+        return f"Error: {e}"
+    return f"The sum is {a + b}"
+
+
+@tool
+def multiply_numbers(input_str: str) -> str:
+    """Multiply two numbers together.
+
+    This tool multiplies two numbers and returns the product.
+
+    Args:
+        input_str: Two numbers separated by a comma (e.g., "34,45" or "5.5,3.2")
+
+    Returns:
+        A string with the product of the two numbers
+
+    Examples:
+        - Input: "34,45" -> Output: "The product is 1530.0"
+        - Input: "10,5" -> Output: "The product is 50.0"
+    """
+    try:
+        a, b = parse_two_numbers(input_str)
+    except ValueError as e:
+        return f"Error: {e}"
+    return f"The product is {a * b}"
+
+
 def example_1_basic_tools():
     """Example 1: Creating and using basic tools"""
     print("=" * 50)
     print("Example 1: Basic Tools")
     print("=" * 50)
-      
-   # Better tool definitions with clear descriptions
-    @tool
-    def add_numbers(input_str: str) -> str:
-        """Add two numbers together.
-        
-        This tool adds two numbers and returns the sum.
-        
-        Args:
-            input_str: Two numbers separated by a comma (e.g., "34,45" or "5.5,3.2")
-            
-        Returns:
-            A string with the sum of the two numbers
-            
-        Examples:
-            - Input: "34,45" -> Output: "The sum is 79.0"
-            - Input: "10,20" -> Output: "The sum is 30.0"
-        """
-        try:
-            # Clean and split the input
-            nums = [n.strip() for n in input_str.split(',')]
-            if len(nums) != 2:
-                return "Error: Please provide exactly two numbers separated by a comma (e.g., '34,45')"
-            
-            result = float(nums[0]) + float(nums[1])
-            return f"The sum is {result}"
-        except ValueError:
-            return "Error: Please provide valid numbers (e.g., '34,45')"
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def multiply_numbers(input_str: str) -> str:
-        """Multiply two numbers together.
-        
-        This tool multiplies two numbers and returns the product.
-        
-        Args:
-            input_str: Two numbers separated by a comma (e.g., "34,45" or "5.5,3.2")
-            
-        Returns:
-            A string with the product of the two numbers
-            
-        Examples:
-            - Input: "34,45" -> Output: "The product is 1530.0"
-            - Input: "10,5" -> Output: "The product is 50.0"
-        """
-        try:
-            # Clean and split the input
-            nums = [n.strip() for n in input_str.split(',')]
-            if len(nums) != 2:
-                return "Error: Please provide exactly two numbers separated by a comma (e.g., '34,45')"
-            
-            result = float(nums[0]) * float(nums[1])
-            return f"The product is {result}"
-        except ValueError:
-            return "Error: Please provide valid numbers (e.g., '34,45')"
-        except Exception as e:
-            return f"Error: {str(e)}"
     
     tools = [add_numbers, multiply_numbers]
     
-    
-    # Create agent using LangGraph (no prompt needed)
-    agent_executor = create_react_agent(llm, tools)
+    # Create agent using LangGraph (no prompt needed); any task can be typed
+    # in, so replies without tool calls must not be capped
+    agent_executor = get_agent(tools, cap_tool_calls=False)
 
     prompt = input("Enter a math task ")
     print(f"\n🤖 Task: {prompt}")
-    result = agent_executor.invoke({
+    
+    # Show the answer as it is generated
+    print("\n✅ Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", prompt)]
     })
-    
-    # Extract final answer
-    final_message = result["messages"][-1]
-    print(f"\n✅ Answer: {final_message.content}\n")
+    print()
+
+
+# Example 2 tools: text processing
+@tool
+def count_characters(text: str) -> str:
+    """Counts the number of characters in text."""
+    return f"Character count: {len(text)}"
+
+
+@tool
+def count_words(text: str) -> str:
+    """Counts the number of words in text."""
+    return f"Word count: {len(text.split())}"
+
+
+@tool
+def reverse_text(text: str) -> str:
+    """Reverses the given text."""
+    return f"Reversed: {text[::-1]}"
+
+
+@tool
+def to_uppercase(text: str) -> str:
+    """Converts text to uppercase."""
+    return text.upper()
+
+
+# Translation table that deletes every vowel
+REMOVE_VOWELS = str.maketrans('', '', 'aeiouAEIOU')
+
+
+@tool
+def find_vowels(text: str) -> str:
+    """Counts vowels in the text."""
+    # One C-level pass: the vowel count is how much shorter the text gets
+    count = len(text) - len(text.translate(REMOVE_VOWELS))
+    return f"Vowel count: {count}"
+
 
 def example_2_text_processing_tools():
     """Example 2: Tools for text processing"""
@@ -108,33 +283,6 @@ def example_2_text_processing_tools():
     print("Example 2: Text Processing Tools")
     print("=" * 50)
     
-    @tool
-    def count_characters(text: str) -> str:
-        """Counts the number of characters in text."""
-        return f"Character count: {len(text)}"
-    
-    @tool
-    def count_words(text: str) -> str:
-        """Counts the number of words in text."""
-        return f"Word count: {len(text.split())}"
-    
-    @tool
-    def reverse_text(text: str) -> str:
-        """Reverses the given text."""
-        return f"Reversed: {text[::-1]}"
-    
-    @tool
-    def to_uppercase(text: str) -> str:
-        """Converts text to uppercase."""
-        return text.upper()
-    
-    @tool
-    def find_vowels(text: str) -> str:
-        """Counts vowels in the text."""
-        vowels = 'aeiouAEIOU'
-        count = sum(1 for char in text if char in vowels)
-        return f"Vowel count: {count}"
-    
     tools = [
         count_characters,
         count_words,
@@ -144,16 +292,76 @@ def example_2_text_processing_tools():
     ]
     
     # Create agent using LangGraph
-    agent_executor = create_react_agent(llm, tools)
+    agent_executor = get_agent(tools)
     
     print("\n🤖 Task: Analyze the text 'LangChain'")
-    result = agent_executor.invoke({
+    print("\n✅ Answer: ", end="", flush=True)
+    stream_answer(agent_executor, {
         "messages": [("human", "For the text 'LangChain', tell me: how many characters, how many words, and how many vowels it has.")]
     })
-    
-    # Extract final answer
-    final_message = result["messages"][-1]
-    print(f"\n✅ Answer: {final_message.content}\n")
+    print()
+
+
+# Example 3 tools: data manipulation
+@lru_cache(maxsize=128)
+def parse_numbers(numbers_str: str) -> np.ndarray:
+    """Parse '1,2,3' once; the agent usually passes the same list to every tool"""
+    numbers = np.array(numbers_str.split(','), dtype=float)
+    numbers.setflags(write=False)  # Shared between tools, so keep it read-only
+    return numbers
+
+
+@tool
+def calculate_average(numbers_str: str) -> str:
+    """
+    Calculates the average of numbers.
+    Input format: comma-separated numbers (e.g., '1,2,3,4,5')
+    """
+    try:
+        numbers = parse_numbers(numbers_str)
+        return f"Average: {numbers.mean():.2f}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@tool
+def find_max(numbers_str: str) -> str:
+    """
+    Finds the maximum number.
+    Input format: comma-separated numbers (e.g., '1,2,3,4,5')
+    """
+    try:
+        numbers = parse_numbers(numbers_str)
+        return f"Maximum: {numbers.max()}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@tool
+def find_min(numbers_str: str) -> str:
+    """
+    Finds the minimum number.
+    Input format: comma-separated numbers (e.g., '1,2,3,4,5')
+    """
+    try:
+        numbers = parse_numbers(numbers_str)
+        return f"Minimum: {numbers.min()}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@tool
+def sort_numbers(numbers_str: str) -> str:
+    """
+    Sorts numbers in ascending order.
+    Input format: comma-separated numbers (e.g., '5,2,8,1,9')
+    """
+    try:
+        # np.sort returns a sorted copy; the cached array stays untouched
+        sorted_nums = np.sort(parse_numbers(numbers_str))
+        return f"Sorted: {', '.join(map(str, sorted_nums.tolist()))}"
+    except Exception as e:
+        return f"Error: {str(e)}"
 
 
 def example_3_data_tools():
@@ -162,300 +370,307 @@ def example_3_data_tools():
     print("Example 3: Data Manipulation Tools")
     print("=" * 50)
     
-    @tool
-    def calculate_average(numbers_str: str) -> str:
-        """
-        Calculates the average of numbers.
-        Input format: comma-separated numbers (e.g., '1,2,3,4,5')
-        """
-        try:
-            numbers = [float(n.strip()) for n in numbers_str.split(',')]
-            avg = sum(numbers) / len(numbers)
-            return f"Average: {avg:.2f}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def find_max(numbers_str: str) -> str:
-        """
-        Finds the maximum number.
-        Input format: comma-separated numbers (e.g., '1,2,3,4,5')
-        """
-        try:
-            numbers = [float(n.strip()) for n in numbers_str.split(',')]
-            return f"Maximum: {max(numbers)}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def find_min(numbers_str: str) -> str:
-        """
-        Finds the minimum number.
-        Input format: comma-separated numbers (e.g., '1,2,3,4,5')
-        """
-        try:
-            numbers = [float(n.strip()) for n in numbers_str.split(',')]
-            return f"Minimum: {min(numbers)}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def sort_numbers(numbers_str: str) -> str:
-        """
-        Sorts numbers in ascending order.
-        Input format: comma-separated numbers (e.g., '5,2,8,1,9')
-        """
-        try:
-            numbers = [float(n.strip()) for n in numbers_str.split(',')]
-            sorted_nums = sorted(numbers)
-            return f"Sorted: {', '.join(map(str, sorted_nums))}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
     tools = [calculate_average, find_max, find_min, sort_numbers]
     
     # Fixed: Create agent properly
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools)
        
     print("\n🤖 Task: Analyze numbers 15, 23, 8, 42, 16")
-    result = agent.invoke({
+    print("\n✅ Answer: ", end="", flush=True)
+    answer = stream_answer(agent, {
         "messages": [("human", "For the numbers 15, 23, 8, 42, 16, find the average, maximum, and sort them.")]
     })
-    
-    # Fixed: Extract final message correctly
-    final_message = result['messages'][-1]
-    print(f"\n✅ Answer: {final_message.content}\n")
+    print()
 
     # Fixed: Follow-up question (if needed)
-    if final_message.content:
+    if answer:
         print("\n🤔 Getting interpretation...")
         
         # Just use LLM directly for follow-up (no agent needed)
-        follow_up_prompt = f"""Based on this data analysis result:{final_message.content}
+        follow_up_prompt = f"""Based on this data analysis result:{answer}
         Please explain what these statistics tell us about the dataset."""
         
-        response = llm.invoke(follow_up_prompt)
-        print(f"\n💡 Interpretation: {response.content}\n")
-
-
-def example_4_api_tools():
-    """Example 4: Tools that interact with APIs"""
-    print("=" * 50)
-    print("Example 4: API Tools")
-    print("=" * 50)
-    
-    # -----------------------------------------------------
-    # 1. Helper function to fetch and cache user data
-    # -----------------------------------------------------
-    def fetch_all_users():
-        """Fetch all users once per request."""
-        resp = requests.get("https://dummyjson.com/users")
+        print("\n💡 Interpretation: ", end="", flush=True)
+        for chunk in llm.stream(follow_up_prompt):
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+        print("\n")
+
+
+# -----------------------------------------------------
+# User API tools (shared by examples 4 and 6)
+# 1. Helper function to fetch and cache user data
+# -----------------------------------------------------
+USERS_URL = "https://dummyjson.com/users"
+USERS_TTL_SECONDS = 300
+# The API pages results (30 per page by default); limit=0 returns every match
+ALL_RESULTS = {"limit": 0}
+
+# One client for all API calls: keep-alive reuses the TCP/TLS connection, and
+# with HTTP/2 tool calls running in parallel threads share it as separate
+# streams instead of queuing or opening more connections
+http = httpx.Client(http2=True, timeout=10.0)
+
+# Last downloaded user list, shared by every tool call
+users_cache = {"users": None, "etag": None, "fetched_at": 0.0}
+users_lock = threading.Lock()
+
+# Operator word or symbol followed by the age, e.g. "less than 30", "> 40", "= 18"
+AGE_CRITERIA_PATTERN = re.compile(r"(less|<|greater|>|equal|=)\D*(\d+)", re.IGNORECASE)
+AGE_OPERATORS = {"less": "less", "<": "less", "greater": "greater", ">": "greater", "equal": "equal", "=": "equal"}
+
+
+def fetch_all_users():
+    """Fetch all users, reusing the cached list for USERS_TTL_SECONDS."""
+    # Tools can run in parallel threads; the lock makes them share one download
+    with users_lock:
+        now = time.monotonic()
+        if users_cache["users"] is not None and now - users_cache["fetched_at"] < USERS_TTL_SECONDS:
+            return users_cache["users"]
+        
+        # After the TTL, ask the server whether the list changed at all
+        headers = {"If-None-Match": users_cache["etag"]} if users_cache["etag"] else {}
+        resp = http.get(USERS_URL, params=ALL_RESULTS, headers=headers)
+        if resp.status_code == 304:
+            users_cache["fetched_at"] = now
+            return users_cache["users"]
+        
         resp.raise_for_status()
-        return resp.json()["users"]
-
-
-    # -----------------------------------------------------
-    # 2. Tools
-    # -----------------------------------------------------
-
-    @tool
-    def filter_users_by_age(criteria: str) -> dict:
-        """
-        Filter users by age.
-        Examples:
-            - 'less than 30'
-            - '< 25'
-            - 'greater than 40'
-            - '= 18'
-        Returns clean JSON output.
-        """
-        criteria = criteria.lower().strip()
-
-        # detect operator
-        if "less" in criteria or "<" in criteria:
-            op = "less"
-        elif "greater" in criteria or ">" in criteria:
-            op = "greater"
-        elif "equal" in criteria or "=" in criteria or criteria.isdigit():
-            op = "equal"
-        else:
+        users_cache.update(
+            users=resp.json()["users"],
+            etag=resp.headers.get("ETag"),
+            fetched_at=now
+        )
+        return users_cache["users"]
+
+
+def fetch_users_where(key, value):
+    """Let the API do the filtering: only matching users are downloaded.
+    Returns every matching user."""
+    resp = http.get(f"{USERS_URL}/filter", params={"key": key, "value": value, **ALL_RESULTS})
+    resp.raise_for_status()
+    return resp.json()["users"]
+
+
+# -----------------------------------------------------
+# 2. Tools
+# -----------------------------------------------------
+@tool
+def filter_users_by_age(criteria: str) -> dict:
+    """
+    Filter users by age.
+    Examples:
+        - 'less than 30'
+        - '< 25'
+        - 'greater than 40'
+        - '= 18'
+    Returns clean JSON output.
+    """
+    criteria = criteria.strip()
+
+    # A bare number means "equal to"
+    if criteria.isdigit():
+        op, value = "equal", int(criteria)
+    else:
+        match = AGE_CRITERIA_PATTERN.search(criteria)
+        if not match:
             return {"error": "Invalid age format. Use 'less than X', 'greater than X', or '= X'."}
+        op, value = AGE_OPERATORS[match.group(1).lower()], int(match.group(2))
 
-        # extract number
-        digits = "".join([c for c in criteria if c.isdigit()])
-        if digits == "":
-            return {"error": "Age number not found."}
-        value = int(digits)
-
+    # The API can filter on an exact age; ranges use the cached full list
+    if op == "equal":
+        filtered = fetch_users_where("age", value)
+    else:
         users = fetch_all_users()
-
-        # filtering
         if op == "less":
             filtered = [u for u in users if u["age"] < value]
-        elif op == "greater":
-            filtered = [u for u in users if u["age"] > value]
         else:
-            filtered = [u for u in users if u["age"] == value]
+            filtered = [u for u in users if u["age"] > value]
 
-        return {
-            "criteria": criteria,
-            "count": len(filtered),
-            "users": filtered
-        }
+    return {
+        "criteria": criteria,
+        "count": len(filtered),
+        "users": filtered
+    }
 
 
-    @tool
-    def get_user_by_id(user_id: int) -> dict:
-        """Return user matching a specific ID."""
-        try:
-            user_id = int(user_id)
-            users = fetch_all_users()
-            for u in users:
-                if u["id"] == user_id:
-                    return u
-            return {"error": f"No user found with id {user_id}"}
-        except:
-            return {"error": "User ID must be a number."}
-
-
-    @tool
-    def search_users_by_city(city: str) -> dict:
-        """Return users who live in the given city."""
-        city = city.lower()
-        users = fetch_all_users()
-        filtered = [u for u in users if u["address"]["city"].lower() == city]
+@tool
+def get_user_by_id(user_id: int) -> dict:
+    """Return user matching a specific ID."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return {"error": "User ID must be a number."}
 
-        return {
-            "city": city,
-            "count": len(filtered),
-            "users": filtered
-        }
+    # Ask for just this user instead of downloading the whole list
+    resp = http.get(f"{USERS_URL}/{user_id}")
+    if resp.status_code == 404:
+        return {"error": f"No user found with id {user_id}"}
+    resp.raise_for_status()
+    return resp.json()
 
 
-    @tool
-    def count_users_by_gender(gender: str) -> str:
-        """Counts and lists ALL users by gender. Ex: 'male' or 'female'."""
-        gender_lower = gender.lower()
-        users = fetch_all_users()
-        filtered = [u for u in users if u["gender"].lower() == gender_lower]
+@tool
+def search_users_by_city(city: str) -> dict:
+    """Return users who live in the given city."""
+    filtered = fetch_users_where("address.city", city)
+    if not filtered:
+        # The API compares exactly; retry case-insensitively on the cached list
+        city_lower = city.lower()
+        filtered = [u for u in fetch_all_users() if u["address"]["city"].lower() == city_lower]
 
-        if not filtered:
-            return f"No {gender} users found"
+    return {
+        "city": city.lower(),
+        "count": len(filtered),
+        "users": filtered
+    }
 
-        result = [f"Found {len(filtered)} {gender} users:\n"]
-        for i, u in enumerate(filtered, 1):
-            result.append(
-                f"{i}. {u['firstName']} {u['lastName']} "
-                f"(Age: {u['age']}, City: {u['address']['city']})"
-            )
-        
-        return "\n".join(result)
 
+@tool
+def count_users_by_gender(gender: str) -> str:
+    """Counts and lists ALL users by gender. Ex: 'male' or 'female'."""
+    filtered = fetch_users_where("gender", gender.lower())
 
-    # -----------------------------------------------------
-    # 3. Create agent
-    # -----------------------------------------------------
-    tools = [filter_users_by_age, get_user_by_id, search_users_by_city, count_users_by_gender]
+    if not filtered:
+        return f"No {gender} users found"
 
-    agent = create_react_agent(llm, tools)
+    result = [f"Found {len(filtered)} {gender} users:\n"]
+    for i, u in enumerate(filtered, 1):
+        result.append(
+            f"{i}. {u['firstName']} {u['lastName']} "
+            f"(Age: {u['age']}, City: {u['address']['city']})"
+        )
 
-    query = input("\nEnter your question about users: ")
+    return "\n".join(result)
 
-    result = agent.invoke({
-        "messages": [("human", query)]
-    })
 
-    final_msg = result["messages"][-1].content
+USER_TOOLS = [filter_users_by_age, get_user_by_id, search_users_by_city, count_users_by_gender]
 
-    print("\n\n✅ Final Result:")
-    print(final_msg)
 
-def example_5_conditional_tools():
-    """Example 5: Tools with conditional logic"""
-    print("=" * 50)
-    print("Example 5: Conditional Logic Tools")
-    print("=" * 50)
+# -----------------------------------------------------
+# Plan-and-execute agent (LLMCompiler-style)
+# -----------------------------------------------------
+# Instead of one model call per tool (think -> act -> observe -> think ...),
+# the model plans every tool call up front, independent calls run at the same
+# time, and one last model call writes the answer from all the results.
+PLANNER_PROMPT = """You plan tool calls to answer a question. Available tools:
+{tools}
+
+Reply with only a JSON list of steps, each like:
+{{"id": 1, "tool": "<tool name>", "args": {{"<arg>": "<value>"}}, "deps": []}}
+List in "deps" the ids of earlier steps a step needs; steps that don't need
+each other must not depend on each other. To pass an earlier step's result
+as an argument, use "$<id>" as the value.
+
+Question: {question}"""
+
+JOINER_PROMPT = """Answer the question using the tool results below.
+
+Question: {question}
+
+Tool results:
+{results}"""
+
+STEP_REFERENCE = re.compile(r"^\$(\d+)$")
+
+
+def parse_step_id(value):
+    """Return a step id as an int; the model may write ids as strings"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def execute_plan(plan, tools_by_name):
+    """Run the planned tool calls, each as soon as the earlier steps it needs are done"""
+    tasks = {}
     
-    @tool
-    def check_even_odd(number_str: str) -> str:
-        """Checks if a number is even or odd. 
+    async def run_step(step, earlier):
+        if not isinstance(step, dict):
+            return f"Error: a step must be a JSON object, got {step!r}"
+        args = step.get("args", {})
+        if not isinstance(args, dict):
+            return f"Error: args must be a JSON object, got {args!r}"
+        deps = step.get("deps", [])
+        if not isinstance(deps, list):
+            deps = [deps]
         
-        Args:
-            number_str: A valid integer number (e.g., "17", "42", "-5")
-            
-        Returns:
-            Whether the number is even or odd, or an error message if input is invalid
-        """
-        try:
-            number = int(number_str)
-            if number % 2 == 0:
-                return f"{number} is EVEN"
-            else:
-                return f"{number} is ODD"
-        except ValueError:
-            return "ERROR: Input must be a valid integer number. Please provide a number like 17, 42, etc."
-        except Exception as e:
-            return f"ERROR: {str(e)}"
-    
-    @tool
-    def check_positive_negative(number_str: str) -> str:
-        """Checks if a number is positive, negative, or zero.
+        # Only steps scheduled before this one can be waited on, so forward,
+        # self and cyclic dependencies are reported instead of hanging
+        refs = {key: int(m.group(1)) for key, value in args.items()
+                if isinstance(value, str) and (m := STEP_REFERENCE.match(value))}
+        needed = [parse_step_id(dep) for dep in deps] + list(refs.values())
+        unknown = [dep for dep in needed if dep not in earlier]
+        if unknown:
+            return f"Error: depends on {unknown}, which are not earlier steps"
+        await asyncio.gather(*(earlier[dep] for dep in set(needed)))
         
-        Args:
-            number_str: A valid number (e.g., "17", "-5", "3.14")
-            
-        Returns:
-            Whether the number is positive, negative, or zero, or an error message
-        """
-        try:
-            number = float(number_str)
-            if number > 0:
-                return f"{number} is POSITIVE"
-            elif number < 0:
-                return f"{number} is NEGATIVE"
-            else:
-                return f"{number} is ZERO"
-        except ValueError:
-            return "ERROR: Input must be a valid number. Please provide a number like 17, -5, or 3.14."
-        except Exception as e:
-            return f"ERROR: {str(e)}"
-    
-    @tool
-    def check_prime(number_str: str) -> str:
-        """Checks if a number is prime.
+        # Replace "$<id>" arguments with that step's result
+        args = {**args, **{key: str(earlier[ref].result()) for key, ref in refs.items()}}
         
-        Args:
-            number_str: A positive integer (e.g., "17", "42")
-            
-        Returns:
-            Whether the number is prime or not, or an error message
-        """
+        tool = tools_by_name.get(step.get("tool"))
+        if tool is None:
+            return f"Error: unknown tool {step.get('tool')!r}"
         try:
-            number = int(number_str)
-            if number < 2:
-                return f"{number} is NOT prime (prime numbers must be >= 2)"
-            for i in range(2, int(number ** 0.5) + 1):
-                if number % i == 0:
-                    return f"{number} is NOT prime"
-            return f"{number} is PRIME"
-        except ValueError:
-            return "ERROR: Input must be a valid positive integer. Please provide a number like 17 or 42."
+            # Sync tools run in a worker thread, so their HTTP calls overlap
+            return await tool.ainvoke(args)
         except Exception as e:
-            return f"ERROR: {str(e)}"
+            return f"Error: {str(e)}"
     
-    tools = [check_even_odd, check_positive_negative, check_prime]
+    for number, step in enumerate(plan, 1):
+        step_id = parse_step_id(step.get("id", number)) if isinstance(step, dict) else None
+        if step_id is None or step_id in tasks:
+            step_id = number if number not in tasks else max(tasks) + 1
+        tasks[step_id] = asyncio.create_task(run_step(step, dict(tasks)))
+    return {step_id: await task for step_id, task in tasks.items()}
+
+
+def plan_and_execute(question, tools):
+    """Answer a question with one planning call, concurrent tools, one answer call"""
+    tools_by_name = {t.name: t for t in tools}
+    tool_list = "\n".join(
+        f"- {t.name}({', '.join(t.args)}): {t.description.strip().splitlines()[0]}"
+        for t in tools
+    )
     
-    agent = create_react_agent(llm, tools)
-
-    print("\n🤖 Task: Check number properties")
-    print("💡 Examples: 17, 42, -5, 100\n")
+    plan_message = llm_long_context.invoke(PLANNER_PROMPT.format(tools=tool_list, question=question))
+    plan = JsonOutputParser().invoke(plan_message)
+    if isinstance(plan, dict):
+        plan = plan.get("steps", [plan])
+    if not isinstance(plan, list):
+        plan = [plan]
+    print(f"📋 Plan: {len(plan)} tool call(s)")
     
-    query = input("Enter a number to analyze (or anything else): ")
+    results = asyncio.run(execute_plan(plan, tools_by_name))
+    results_text = "\n".join(f"[{step_id}] {result}" for step_id, result in results.items())
     
-    # Simplified prompt - let the agent figure it out
-    result = agent.invoke({
-        "messages": [
-            ("system", """You are a number analysis assistant with access to three tools:
+    answer = llm_long_context.invoke(JOINER_PROMPT.format(question=question, results=results_text))
+    return answer.content
+
+
+def example_4_api_tools():
+    """Example 4: Tools that interact with APIs"""
+    print("=" * 50)
+    print("Example 4: API Tools")
+    print("=" * 50)
+    
+    # Create agent with the user API tools defined above
+    tools = USER_TOOLS
+
+    agent = get_agent(tools, prompt=PARALLEL_TOOLS_PROMPT, long_context=True, cap_tool_calls=False)
+
+    query = input("\nEnter your question about users: ")
+
+    print("\n\n✅ Final Result:")
+    stream_answer(agent, {
+        "messages": [("human", query)]
+    })
+
+
+# Fixed system prompt for example 5, defined once so every run starts with
+# exactly the same text
+NUMBER_ANALYSIS_PROMPT = """You are a number analysis assistant with access to three tools:
 1. check_even_odd - determines if a number is even or odd
 2. check_positive_negative - determines if a number is positive, negative, or zero
 3. check_prime - determines if a number is prime
@@ -468,16 +683,130 @@ When given something that is NOT a number (like text, words, empty input):
 - Do NOT try to use the tools (they will return errors)
 - Politely explain you can only analyze numbers
 - Give examples of valid inputs (like 17, 42, -5, 100)
-- Ask the user to provide a valid number"""),
-            ("human", f"Analyze: {query}")
-        ]
-    })
+- Ask the user to provide a valid number"""
+
+
+# Example 5 tools: conditional logic
+@tool
+def check_even_odd(number_str: str) -> str:
+    """Checks if a number is even or odd. 
+
+    Args:
+        number_str: A valid integer number (e.g., "17", "42", "-5")
+
+    Returns:
+        Whether the number is even or odd, or an error message if input is invalid
+    """
+    try:
+        number = int(number_str)
+        if number % 2 == 0:
+            return f"{number} is EVEN"
+        else:
+            return f"{number} is ODD"
+    except ValueError:
+        return "ERROR: Input must be a valid integer number. Please provide a number like 17, 42, etc."
+    except Exception as e:
+        return f"ERROR: {str(e)}"
+
+
+@tool
+def check_positive_negative(number_str: str) -> str:
+    """Checks if a number is positive, negative, or zero.
+
+    Args:
+        number_str: A valid number (e.g., "17", "-5", "3.14")
+
+    Returns:
+        Whether the number is positive, negative, or zero, or an error message
+    """
+    try:
+        number = float(number_str)
+        if number > 0:
+            return f"{number} is POSITIVE"
+        elif number < 0:
+            return f"{number} is NEGATIVE"
+        else:
+            return f"{number} is ZERO"
+    except ValueError:
+        return "ERROR: Input must be a valid number. Please provide a number like 17, -5, or 3.14."
+    except Exception as e:
+        return f"ERROR: {str(e)}"
+
+
+@lru_cache(maxsize=10000)
+def is_prime(number: int) -> bool:
+    """Trial division over 6k±1 only: every prime above 3 has that form"""
+    if number < 4:
+        return number >= 2
+    if number % 2 == 0 or number % 3 == 0:
+        return False
+    # Exact integer square root, computed once instead of i * i every step
+    limit = isqrt(number)
+    i = 5
+    while i <= limit:
+        if number % i == 0 or number % (i + 2) == 0:
+            return False
+        i += 6
+    return True
+
+
+@tool
+def check_prime(number_str: str) -> str:
+    """Checks if a number is prime.
+
+    Args:
+        number_str: A positive integer (e.g., "17", "42")
+
+    Returns:
+        Whether the number is prime or not, or an error message
+    """
+    try:
+        number = int(number_str)
+        if number < 2:
+            return f"{number} is NOT prime (prime numbers must be >= 2)"
+        return f"{number} is PRIME" if is_prime(number) else f"{number} is NOT prime"
+    except ValueError:
+        return "ERROR: Input must be a valid positive integer. Please provide a number like 17 or 42."
+    except Exception as e:
+        return f"ERROR: {str(e)}"
+
 
-    final_msg = result["messages"][-1].content
+def example_5_conditional_tools():
+    """Example 5: Tools with conditional logic"""
+    print("=" * 50)
+    print("Example 5: Conditional Logic Tools")
+    print("=" * 50)
+    
+    tools = [check_even_odd, check_positive_negative, check_prime]
 
-    print("\n✅ Final Result:")
+    print("\n🤖 Task: Check number properties")
+    print("💡 Examples: 17, 42, -5, 100 (ask again in other words to hit the cache)\n")
+    
+    while True:
+        query = input("Enter a number to analyze (or anything else, empty to stop): ")
+        if not query.strip():
+            break
+        
+        # Simplified prompt - let the agent figure it out
+        print("\n✅ Final Result:")
+        ask_agent(tools, f"Analyze: {query}", system=NUMBER_ANALYSIS_PROMPT)
+        print()
+
+def example_6_plan_and_execute():
+    """Example 6: Planning all tool calls up front and running them concurrently"""
+    print("=" * 50)
+    print("Example 6: Plan-and-Execute Agent")
+    print("=" * 50)
+    
+    print("💡 Example: How many users are female, and who lives in Phoenix?")
+    query = input("\nEnter your question about users: ")
+    
+    final_msg = plan_and_execute(query, USER_TOOLS)
+    
+    print("\n\n✅ Final Result:")
     print(final_msg)
 
+
 def main():
     """Run all examples"""
     print("\n🚀 LangChain Tools and Toolkits Examples\n")
@@ -492,6 +821,7 @@ def main():
         # example_3_data_tools()
         # example_4_api_tools()
         example_5_conditional_tools()
+        # example_6_plan_and_execute()
         
        
     except Exception as e:
@@ -2,13 +2,15 @@
 Lesson 9: Custom Tools
 """
 
+import json
 import os
 import re
-from datetime import datetime
+import string
+from datetime import date, datetime
+from functools import lru_cache
 from typing import Dict
 from dotenv import load_dotenv
-from langgraph.prebuilt import create_react_agent
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
 from pydantic import BaseModel, Field
 from langchain_ollama import ChatOllama
 
@@ -20,9 +22,117 @@ llm = ChatOllama(
     model=model,
     temperature=0,
     num_ctx=2048,
-    num_predict=512
+    num_predict=512,
+    # Keep the model (and its cached prompt prefix) loaded between examples
+    keep_alive=-1
 )
 
+# Compiled agents, one per (tool names, prompt)
+agent_cache = {}
+
+
+def get_agent(tools, prompt=None):
+    """Build the agent graph for a set of tools once and reuse it afterwards"""
+    # Same tools in the same order and the same system prompt: every request
+    # starts with byte-identical text, so Ollama can reuse its cached prefix
+    tools = sorted(tools, key=lambda t: t.name)
+    key = (tuple(t.name for t in tools), prompt)
+    if key not in agent_cache:
+        # langgraph is imported on first use; it is the slowest import here
+        from langgraph.prebuilt import create_react_agent
+        agent_cache[key] = create_react_agent(llm, tools, prompt=prompt)
+    return agent_cache[key]
+
+
+# Validation patterns, compiled once instead of on every tool call
+URL_PATTERN = re.compile(r'^https?://[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}.*$')
+PHONE_SEPARATORS = re.compile(r'[- ().]')
+
+# Characters allowed in each part of an email address (same rules as the
+# old regex ^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$)
+EMAIL_LETTERS = frozenset(string.ascii_letters)
+EMAIL_LOCAL_CHARS = EMAIL_LETTERS | frozenset(string.digits + "._%+-")
+EMAIL_DOMAIN_CHARS = EMAIL_LETTERS | frozenset(string.digits + ".-")
+
+
+def is_valid_email(email: str) -> bool:
+    """Check 'local@domain.tld' with plain set lookups, no regex engine"""
+    local, at, domain = email.partition("@")
+    host, dot, tld = domain.rpartition(".")
+    return (
+        bool(at and local and host and dot) and len(tld) >= 2
+        and EMAIL_LOCAL_CHARS.issuperset(local)
+        and EMAIL_DOMAIN_CHARS.issuperset(host)
+        and EMAIL_LETTERS.issuperset(tld)
+    )
+
+
+# Tools that only depend on their input are memoized with lru_cache under
+# @tool: an agent repeating a call with the same arguments gets the stored
+# result. Tools that read the current date are not cached.
+
+# Example 1 tools: validation
+VALIDATION_PROMPT = (
+    "You are a validation assistant. "
+    "Validate the following email information using the appropriate tool."
+)
+
+
+@tool
+@lru_cache(maxsize=512)
+def validate_email(email: str) -> str:
+    """
+    Validates an email address format.
+    Input: email address (e.g., 'user@example.com')
+    Returns: validation result
+    """
+    try:
+        # Basic email validation
+        if is_valid_email(email):
+            return f"✅ '{email}' is a VALID email address"
+        else:
+            return f"❌ '{email}' is INVALID email format"
+    except Exception as e:
+        return f"Error validating email: {str(e)}"
+
+
+@tool
+@lru_cache(maxsize=512)
+def validate_phone(phone: str) -> str:
+    """
+    Validates a phone number (US format).
+    Input: phone number (e.g., '123-456-7890' or '1234567890')
+    Returns: validation result
+    """
+    try:
+        # Remove common separators
+        clean_phone = PHONE_SEPARATORS.sub('', phone)
+
+        if len(clean_phone) == 10 and clean_phone.isdigit():
+            formatted = f"({clean_phone[:3]}) {clean_phone[3:6]}-{clean_phone[6:]}"
+            return f"✅ Valid phone: {formatted}"
+        else:
+            return f"❌ Invalid phone number format"
+    except Exception as e:
+        return f"Error validating phone: {str(e)}"
+
+
+@tool
+@lru_cache(maxsize=512)
+def validate_url(url: str) -> str:
+    """
+    Validates a URL format.
+    Input: URL (e.g., 'https://example.com')
+    Returns: validation result
+    """
+    try:
+        if URL_PATTERN.match(url):
+            return f"✅ '{url}' is a VALID URL"
+        else:
+            return f"❌ '{url}' is INVALID URL format"
+    except Exception as e:
+        return f"Error validating URL: {str(e)}"
+
 
 def example_1_validation_tools():
     """Example 1: Tools with input validation"""
@@ -30,142 +140,88 @@ def example_1_validation_tools():
     print("Example 1: Validation Tools")
     print("=" * 50)
     
-    @tool
-    def validate_email(email: str) -> str:
-        """
-        Validates an email address format.
-        Input: email address (e.g., 'user@example.com')
-        Returns: validation result
-        """
-        try:
-            # Basic email validation
-            pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if re.match(pattern, email):
-                return f"✅ '{email}' is a VALID email address"
-            else:
-                return f"❌ '{email}' is INVALID email format"
-        except Exception as e:
-            return f"Error validating email: {str(e)}"
-    
-    @tool
-    def validate_phone(phone: str) -> str:
-        """
-        Validates a phone number (US format).
-        Input: phone number (e.g., '123-456-7890' or '1234567890')
-        Returns: validation result
-        """
-        try:
-            # Remove common separators
-            clean_phone = re.sub(r'[- ().]', '', phone)
-            
-            if len(clean_phone) == 10 and clean_phone.isdigit():
-                formatted = f"({clean_phone[:3]}) {clean_phone[3:6]}-{clean_phone[6:]}"
-                return f"✅ Valid phone: {formatted}"
-            else:
-                return f"❌ Invalid phone number format"
-        except Exception as e:
-            return f"Error validating phone: {str(e)}"
-    
-    @tool
-    def validate_url(url: str) -> str:
-        """
-        Validates a URL format.
-        Input: URL (e.g., 'https://example.com')
-        Returns: validation result
-        """
-        try:
-            pattern = r'^https?://[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}.*$'
-            if re.match(pattern, url):
-                return f"✅ '{url}' is a VALID URL"
-            else:
-                return f"❌ '{url}' is INVALID URL format"
-        except Exception as e:
-            return f"Error validating URL: {str(e)}"
-    
     tools = [validate_email, validate_phone, validate_url]
     
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools, prompt=VALIDATION_PROMPT)
     
     prompt = input("Check if the email entered is valid or not : ")    
     print("\n🤖 Task: Validate contact information")
     result = agent.invoke({
-        "messages": [("system", """
-                      You are a validation assistant.
-                      Validate the following email information using the appropriate tool.
-                      """),
-                     ("human", prompt)
-                     ]
+        "messages": [("human", prompt)]
     })
     print(f"\n✅ Answer: {result['messages'][-1].content}\n")
 
 
+# Example 2 tools: data processing
+@tool
+def parse_json(json_str: str) -> str:
+    """
+    Parses and validates JSON string.
+    Input: JSON string
+    Returns: parsed data or error
+    """
+    try:
+        data = json.loads(json_str)
+        return f"Valid JSON with {len(data)} items: {json.dumps(data, indent=2)}"
+    except json.JSONDecodeError as e:
+        return f"Invalid JSON: {str(e)}"
+
+
+@tool
+def calculate_statistics(numbers_str: str) -> str:
+    """
+    Calculates statistics for a list of numbers.
+    Input: comma-separated numbers (e.g., '1,2,3,4,5')
+    Returns: mean, median, min, max, sum
+    """
+    # Imported here: only this tool needs NumPy
+    import numpy as np
+    
+    try:
+        # Parse and reduce with NumPy: each statistic is one C loop
+        numbers = np.array(numbers_str.split(','), dtype=float)
+        if numbers.size == 0:
+            return "Error: No numbers provided"
+
+        return f"""Statistics:
+- Count: {numbers.size}
+- Sum: {numbers.sum()}
+- Mean: {numbers.mean():.2f}
+- Median: {np.median(numbers)}
+- Min: {numbers.min()}
+- Max: {numbers.max()}"""
+    except Exception as e:
+        return f"Error calculating statistics: {str(e)}"
+
+
+@tool
+def format_data(data_str: str) -> str:
+    """
+    Formats data into a readable table format.
+    Input: data in format 'key1:value1,key2:value2'
+    Returns: formatted table
+    """
+    try:
+        items = data_str.split(',')
+        formatted = "| Key | Value |\n|-----|-------|\n"
+        for item in items:
+            if ':' in item:
+                key, value = item.split(':', 1)
+                formatted += f"| {key.strip()} | {value.strip()} |\n"
+        return formatted
+    except Exception as e:
+        return f"Error formatting data: {str(e)}"
+
+
 def example_2_data_processing_tools():
     """Example 2: Tools for data processing and analysis"""
     print("=" * 50)
     print("Example 2: Data Processing Tools")
     print("=" * 50)
     
-    @tool
-    def parse_json(json_str: str) -> str:
-        """
-        Parses and validates JSON string.
-        Input: JSON string
-        Returns: parsed data or error
-        """
-        try:
-            data = json.loads(json_str)
-            return f"Valid JSON with {len(data)} items: {json.dumps(data, indent=2)}"
-        except json.JSONDecodeError as e:
-            return f"Invalid JSON: {str(e)}"
-    
-    @tool
-    def calculate_statistics(numbers_str: str) -> str:
-        """
-        Calculates statistics for a list of numbers.
-        Input: comma-separated numbers (e.g., '1,2,3,4,5')
-        Returns: mean, median, min, max, sum
-        """
-        try:
-            numbers = [float(n.strip()) for n in numbers_str.split(',')]
-            if not numbers:
-                return "Error: No numbers provided"
-            
-            mean = sum(numbers) / len(numbers)
-            sorted_nums = sorted(numbers)
-            median = sorted_nums[len(numbers)//2] if len(numbers) % 2 else \
-                    (sorted_nums[len(numbers)//2-1] + sorted_nums[len(numbers)//2]) / 2
-            
-            return f"""Statistics:
-- Count: {len(numbers)}
-- Sum: {sum(numbers)}
-- Mean: {mean:.2f}
-- Median: {median}
-- Min: {min(numbers)}
-- Max: {max(numbers)}"""
-        except Exception as e:
-            return f"Error calculating statistics: {str(e)}"
-    
-    @tool
-    def format_data(data_str: str) -> str:
-        """
-        Formats data into a readable table format.
-        Input: data in format 'key1:value1,key2:value2'
-        Returns: formatted table
-        """
-        try:
-            items = data_str.split(',')
-            formatted = "| Key | Value |\n|-----|-------|\n"
-            for item in items:
-                if ':' in item:
-                    key, value = item.split(':', 1)
-                    formatted += f"| {key.strip()} | {value.strip()} |\n"
-            return formatted
-        except Exception as e:
-            return f"Error formatting data: {str(e)}"
-    
     tools = [parse_json, calculate_statistics, format_data]
     
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools)
     
     print("\n🤖 Task: Calculate statistics for test scores")
     result = agent.invoke({
@@ -174,72 +230,76 @@ def example_2_data_processing_tools():
     print(f"\n✅ Answer: {result['messages'][-1].content}\n")
 
 
+# Example 3 tools: date and time
+@tool
+def get_current_datetime() -> str:
+    """Returns the current date and time."""
+    now = datetime.now()
+    return now.strftime("%Y-%m-%d %H:%M:%S")
+
+
+@tool
+def calculate_age(birth_year: str) -> str:
+    """
+    Calculates age from birth year.
+    Input: birth year (e.g., '1990')
+    Returns: current age
+    """
+    try:
+        year = int(birth_year)
+        age = date.today().year - year
+        return f"Age: {age} years old"
+    except ValueError:
+        return "Error: Invalid year format"
+
+
+@tool
+def days_until_date(date_str: str) -> str:
+    """
+    Calculates days until a future date.
+    Input: date in format 'YYYY-MM-DD'
+    Returns: number of days
+    """
+    try:
+        # Compare calendar dates: subtracting datetime.now() counted the
+        # hours already gone today, so tomorrow came out as 0 days
+        target_date = date.fromisoformat(date_str)
+        days = (target_date - date.today()).days
+
+        if days > 0:
+            return f"{days} days until {date_str}"
+        elif days == 0:
+            return f"Today is {date_str}!"
+        else:
+            return f"{date_str} was {abs(days)} days ago"
+    except ValueError:
+        return "Error: Invalid date format. Use YYYY-MM-DD"
+
+
+@tool
+@lru_cache(maxsize=512)
+def day_of_week(date_str: str) -> str:
+    """
+    Gets the day of week for a date.
+    Input: date in format 'YYYY-MM-DD'
+    Returns: day name
+    """
+    try:
+        day_name = date.fromisoformat(date_str).strftime("%A")
+        return f"{date_str} is a {day_name}"
+    except ValueError:
+        return "Error: Invalid date format. Use YYYY-MM-DD"
+
+
 def example_3_datetime_tools():
     """Example 3: Tools for date and time operations"""
     print("=" * 50)
     print("Example 3: DateTime Tools")
     print("=" * 50)
     
-    @tool
-    def get_current_datetime() -> str:
-        """Returns the current date and time."""
-        now = datetime.now()
-        return now.strftime("%Y-%m-%d %H:%M:%S")
-    
-    @tool
-    def calculate_age(birth_year: str) -> str:
-        """
-        Calculates age from birth year.
-        Input: birth year (e.g., '1990')
-        Returns: current age
-        """
-        try:
-            year = int(birth_year)
-            current_year = datetime.now().year
-            age = current_year - year
-            return f"Age: {age} years old"
-        except ValueError:
-            return "Error: Invalid year format"
-    
-    @tool
-    def days_until_date(date_str: str) -> str:
-        """
-        Calculates days until a future date.
-        Input: date in format 'YYYY-MM-DD'
-        Returns: number of days
-        """
-        try:
-            target_date = datetime.strptime(date_str, "%Y-%m-%d")
-            today = datetime.now()
-            delta = target_date - today
-            days = delta.days
-            
-            if days > 0:
-                return f"{days} days until {date_str}"
-            elif days == 0:
-                return f"Today is {date_str}!"
-            else:
-                return f"{date_str} was {abs(days)} days ago"
-        except ValueError:
-            return "Error: Invalid date format. Use YYYY-MM-DD"
-    
-    @tool
-    def day_of_week(date_str: str) -> str:
-        """
-        Gets the day of week for a date.
-        Input: date in format 'YYYY-MM-DD'
-        Returns: day name
-        """
-        try:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
-            day_name = date.strftime("%A")
-            return f"{date_str} is a {day_name}"
-        except ValueError:
-            return "Error: Invalid date format. Use YYYY-MM-DD"
-    
     tools = [get_current_datetime, calculate_age, days_until_date, day_of_week]
     
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools)
     
     print("\n🤖 Task: Date calculations")
     result = agent.invoke({
@@ -248,84 +308,93 @@ def example_3_datetime_tools():
     print(f"\n✅ Answer: {result['messages'][-1].content}\n")
 
 
-def example_4_business_logic_tools():
-    """Example 4: Tools with business logic"""
-    print("=" * 50)
-    print("Example 4: Business Logic Tools")
-    print("=" * 50)
-    
-    @tool
-    def calculate_discount(input_str: str) -> str:
-        """
-        Calculates discounted price.
-        Input: 'price,discount_percent' (e.g., '100,20' for $100 with 20% off)
-        Returns: final price after discount
-        """
-        try:
-            parts = input_str.split(',')
-            price = float(parts[0])
-            discount_percent = float(parts[1])
-            
-            if price < 0 or discount_percent < 0 or discount_percent > 100:
-                return "Error: Invalid values"
-            
-            discount_amount = price * (discount_percent / 100)
-            final_price = price - discount_amount
-            
-            return f"""Price breakdown:
+# Example 4 tools: business logic
+def parse_two_numbers(input_str):
+    """Parse 'a,b' into two floats; partition stops at the first comma"""
+    first, comma, second = input_str.partition(',')
+    if not comma:
+        raise ValueError("Please provide two numbers separated by a comma (e.g., '100,20')")
+    return float(first), float(second)
+
+
+@tool
+@lru_cache(maxsize=512)
+def calculate_discount(input_str: str) -> str:
+    """
+    Calculates discounted price.
+    Input: 'price,discount_percent' (e.g., '100,20' for $100 with 20% off)
+    Returns: final price after discount
+    """
+    try:
+        price, discount_percent = parse_two_numbers(input_str)
+
+        if price < 0 or discount_percent < 0 or discount_percent > 100:
+            return "Error: Invalid values"
+
+        discount_amount = price * (discount_percent / 100)
+        final_price = price - discount_amount
+
+        return f"""Price breakdown:
 - Original: ${price:.2f}
 - Discount: {discount_percent}% (${discount_amount:.2f})
 - Final price: ${final_price:.2f}"""
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def calculate_tax(input_str: str) -> str:
-        """
-        Calculates tax on an amount.
-        Input: 'amount,tax_rate' (e.g., '100,8.5' for $100 with 8.5% tax)
-        Returns: amount with tax
-        """
-        try:
-            parts = input_str.split(',')
-            amount = float(parts[0])
-            tax_rate = float(parts[1])
-            
-            tax_amount = amount * (tax_rate / 100)
-            total = amount + tax_amount
-            
-            return f"""Tax calculation:
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@tool
+@lru_cache(maxsize=512)
+def calculate_tax(input_str: str) -> str:
+    """
+    Calculates tax on an amount.
+    Input: 'amount,tax_rate' (e.g., '100,8.5' for $100 with 8.5% tax)
+    Returns: amount with tax
+    """
+    try:
+        amount, tax_rate = parse_two_numbers(input_str)
+
+        tax_amount = amount * (tax_rate / 100)
+        total = amount + tax_amount
+
+        return f"""Tax calculation:
 - Subtotal: ${amount:.2f}
 - Tax ({tax_rate}%): ${tax_amount:.2f}
 - Total: ${total:.2f}"""
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @tool
-    def calculate_tip(input_str: str) -> str:
-        """
-        Calculates tip for a bill.
-        Input: 'bill_amount,tip_percent' (e.g., '50,20' for $50 with 20% tip)
-        Returns: tip amount and total
-        """
-        try:
-            parts = input_str.split(',')
-            bill = float(parts[0])
-            tip_percent = float(parts[1])
-            
-            tip_amount = bill * (tip_percent / 100)
-            total = bill + tip_amount
-            
-            return f"""Tip calculation:
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+@tool
+@lru_cache(maxsize=512)
+def calculate_tip(input_str: str) -> str:
+    """
+    Calculates tip for a bill.
+    Input: 'bill_amount,tip_percent' (e.g., '50,20' for $50 with 20% tip)
+    Returns: tip amount and total
+    """
+    try:
+        bill, tip_percent = parse_two_numbers(input_str)
+
+        tip_amount = bill * (tip_percent / 100)
+        total = bill + tip_amount
+
+        return f"""Tip calculation:
 - Bill: ${bill:.2f}
 - Tip ({tip_percent}%): ${tip_amount:.2f}
 - Total: ${total:.2f}"""
-        except Exception as e:
-            return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def example_4_business_logic_tools():
+    """Example 4: Tools with business logic"""
+    print("=" * 50)
+    print("Example 4: Business Logic Tools")
+    print("=" * 50)
     
     tools = [calculate_discount, calculate_tax, calculate_tip]
     
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools)
     
     print("\n🤖 Task: Shopping calculation")
     result = agent.invoke({
@@ -365,7 +434,7 @@ Body: {body[:50]}..."""
     
     tools = [email_tool]
     
-    agent = create_react_agent(llm, tools)
+    agent = get_agent(tools)
     
     print("\n🤖 Task: Send an email")
     result = agent.invoke({
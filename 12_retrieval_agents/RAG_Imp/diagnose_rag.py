@@ -73,14 +73,15 @@ except Exception as e:
 
 # Check 5: Ollama Service Status
 print("\n5️⃣ Ollama Service Status:")
+ollama_models = None  # Model list from /api/tags, reused by check 6
 try:
     import requests
     response = requests.get('http://localhost:11434/api/tags', timeout=5)
     if response.status_code == 200:
         print("   ✅ Ollama service is running on http://localhost:11434")
-        models = response.json().get('models', [])
-        print(f"   📋 Available models: {len(models)}")
-        for m in models[:5]:  # Show first 5
+        ollama_models = response.json().get('models', [])
+        print(f"   📋 Available models: {len(ollama_models)}")
+        for m in ollama_models[:5]:  # Show first 5
             print(f"      - {m['name']}")
     else:
         print(f"   ⚠️ Ollama responded with status: {response.status_code}")
@@ -92,22 +93,20 @@ except Exception as e:
 
 # Check 6: Model Availability
 print("\n6️⃣ Checking Model Availability:")
-if model:
-    try:
-        import requests
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            model_names = [m['name'] for m in models]
-            
-            if model in model_names or f"{model}:latest" in model_names:
-                print(f"   ✅ Model '{model}' is available")
-            else:
-                print(f"   ❌ Model '{model}' not found")
-                print(f"   💡 Pull model with: ollama pull {model}")
-                print(f"   📋 Available models: {', '.join(model_names[:3])}")
-    except Exception as e:
-        print(f"   ⚠️ Could not verify model: {e}")
+if model and ollama_models is not None:
+    model_names = [m['name'] for m in ollama_models]
+    # Every listed name, plus the bare name of each ':latest' tag
+    known_names = set(model_names)
+    known_names.update(name[:-len(':latest')] for name in model_names if name.endswith(':latest'))
+    
+    if model in known_names:
+        print(f"   ✅ Model '{model}' is available")
+    else:
+        print(f"   ❌ Model '{model}' not found")
+        print(f"   💡 Pull model with: ollama pull {model}")
+        print(f"   📋 Available models: {', '.join(model_names[:3])}")
+elif model:
+    print("   ⚠️ Could not verify model: Ollama model list unavailable")
 
 # Check 7: Test Embeddings
 print("\n7️⃣ Testing Embeddings:")
@@ -135,10 +134,14 @@ else:
 print("\n8️⃣ Documents Folder:")
 docs_path = "./documents"
 if os.path.exists(docs_path):
-    files = os.listdir(docs_path)
-    pdf_files = [f for f in files if f.endswith('.pdf')]
-    txt_files = [f for f in files if f.endswith('.txt')]
-    md_files = [f for f in files if f.endswith('.md')]
+    # One directory scan; each entry keeps its name, type and (once read) stat
+    pdf_files, txt_files, md_files = [], [], []
+    by_extension = {'.pdf': pdf_files, '.txt': txt_files, '.md': md_files}
+    with os.scandir(docs_path) as entries:
+        for entry in entries:
+            matching = by_extension.get(os.path.splitext(entry.name)[1])
+            if matching is not None:
+                matching.append(entry)
     
     print(f"   ✅ Folder exists")
     print(f"   📄 PDF files: {len(pdf_files)}")
@@ -147,9 +150,9 @@ if os.path.exists(docs_path):
     
     if pdf_files:
         print(f"   📋 PDF files found:")
-        for f in pdf_files[:3]:
-            size = os.path.getsize(os.path.join(docs_path, f)) / 1024
-            print(f"      - {f} ({size:.1f} KB)")
+        for entry in pdf_files[:3]:
+            size = entry.stat().st_size / 1024
+            print(f"      - {entry.name} ({size:.1f} KB)")
     
     if not (pdf_files or txt_files or md_files):
         print("   ⚠️ No documents found!")
@@ -161,10 +164,8 @@ else:
 print("\n9️⃣ Vector Store:")
 chroma_path = "./chroma_db_new"
 if os.path.exists(chroma_path):
-    import os
-    size = sum(os.path.getsize(os.path.join(chroma_path, f)) 
-               for f in os.listdir(chroma_path) 
-               if os.path.isfile(os.path.join(chroma_path, f))) / (1024 * 1024)
+    with os.scandir(chroma_path) as entries:
+        size = sum(entry.stat().st_size for entry in entries if entry.is_file()) / (1024 * 1024)
     print(f"   ✅ Vector store exists")
     print(f"   📊 Size: {size:.2f} MB")
     
@@ -2,14 +2,20 @@
 RAG Implementation - Simple Learning Example
 Clean version with efficient logging
 """
+import math
 import os
 import sys
 import time
 import signal
 import atexit
 import logging
+import sqlite3
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, DirectoryLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -17,7 +23,6 @@ from langchain_chroma import Chroma
 from langchain_ollama import OllamaEmbeddings, ChatOllama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
 from tqdm import tqdm
 
 load_dotenv()
@@ -27,6 +32,11 @@ DOCUMENTS_PATH = "./documents"
 CHROMA_PATH = "./chroma_db_new"
 MODEL_NAME = os.getenv("model_2")
 LOG_FILE = "rag_system.log"
+EMBED_BATCH_SIZE = 64  # Chunks embedded per Ollama request
+EMBED_WORKERS = 4  # Embedding requests in flight at once
+CHROMA_WRITE_BATCH_SIZE = 1024  # Chunks stored per Chroma write (below its max batch size)
+QUESTION_CACHE_THRESHOLD = 0.95  # Cosine similarity for reusing an earlier answer
+QUESTION_CACHE_SIZE = 128  # Answers kept; the oldest is dropped first
 
 # Setup Logging (100MB max, 3 backups)
 logger = logging.getLogger(__name__)
@@ -52,29 +62,36 @@ def signal_handler(sig, frame):
     log_shutdown()
     sys.exit(0)
 
-# Register shutdown handlers
-atexit.register(log_shutdown)
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
 
-# Log startup
-logger.info("="*50)
-logger.info(f"App started | Model: {MODEL_NAME}")
+def ignore_interrupts():
+    """Leave Ctrl+C to the main process (runs in each PDF worker)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def load_pdf(path):
+    """Parse one PDF (runs in a worker process)"""
+    return PyPDFLoader(str(path)).load()
 
 
 def load_documents():
     """Load PDF, TXT, and MD files"""
     print("📂 Loading documents...")
     
-    pdf_loader = DirectoryLoader(DOCUMENTS_PATH, glob="**/*.pdf", loader_cls=PyPDFLoader)
-    txt_loader = DirectoryLoader(DOCUMENTS_PATH, glob="**/*.txt", loader_cls=TextLoader, loader_kwargs={'encoding': 'utf-8'})
-    md_loader = DirectoryLoader(DOCUMENTS_PATH, glob="**/*.md", loader_cls=TextLoader, loader_kwargs={'encoding': 'utf-8'})
+    # pypdf parsing is pure Python and CPU-bound, so PDFs are spread over
+    # worker processes; text files are I/O-bound and load on threads
+    pdf_paths = sorted(Path(DOCUMENTS_PATH).glob("**/*.pdf"))
+    txt_loader = DirectoryLoader(DOCUMENTS_PATH, glob="**/*.txt", loader_cls=TextLoader, loader_kwargs={'encoding': 'utf-8'}, use_multithreading=True)
+    md_loader = DirectoryLoader(DOCUMENTS_PATH, glob="**/*.md", loader_cls=TextLoader, loader_kwargs={'encoding': 'utf-8'}, use_multithreading=True)
     
     docs = []
     try:
-        docs.extend(pdf_loader.load())
-        docs.extend(txt_loader.load())
-        docs.extend(md_loader.load())
+        with ProcessPoolExecutor(initializer=ignore_interrupts) as executor:
+            # Text files load while the PDFs are parsed
+            pdf_pages = executor.map(load_pdf, pdf_paths)
+            text_docs = txt_loader.load() + md_loader.load()
+            for pages in pdf_pages:
+                docs.extend(pages)
+        docs.extend(text_docs)
     except Exception as e:
         logger.error(f"Error loading documents: {e}")
         print(f"❌ {e}")
@@ -99,6 +116,19 @@ def split_documents(documents):
     return chunks
 
 
+def enable_wal(persist_directory):
+    """Switch Chroma's sqlite file to write-ahead logging"""
+    # The journal mode is stored in the database file, so Chroma's own
+    # connections use it too: a commit appends to the WAL instead of
+    # rewriting a rollback journal, with fewer fsyncs per write
+    conn = sqlite3.connect(os.path.join(persist_directory, "chroma.sqlite3"))
+    try:
+        mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        logger.info(f"Chroma sqlite journal mode: {mode}")
+    finally:
+        conn.close()
+
+
 def create_vectorstore(chunks):
     """Create vector store with embeddings"""
     print(f"🔍 Creating vector store ({len(chunks)} chunks)...")
@@ -110,23 +140,61 @@ def create_vectorstore(chunks):
         embedding_function=embeddings,
         persist_directory=CHROMA_PATH
     )
+    enable_wal(CHROMA_PATH)
+    
+    # Unpack the Documents once into parallel lists; batches are slices of these
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
     
     start = time.time()
-    with tqdm(total=len(chunks), desc="Embedding", unit="chunk") as pbar:
-        for i, chunk in enumerate(chunks):
+    stored = 0
+    # Finished embeddings wait here and go to Chroma in large writes: each
+    # write is one sqlite transaction and one index update
+    pending_texts, pending_vectors, pending_metadatas = [], [], []
+    
+    def write_pending():
+        nonlocal stored
+        vectorstore._collection.add(
+            ids=[str(uuid.uuid4()) for _ in pending_texts],
+            embeddings=pending_vectors,
+            documents=pending_texts,
+            metadatas=pending_metadatas
+        )
+        stored += len(pending_texts)
+        elapsed = (time.time() - start) / 60
+        logger.info(f"Progress: {stored}/{len(chunks)} stored | {elapsed:.1f}min")
+        pending_texts.clear()
+        pending_vectors.clear()
+        pending_metadatas.clear()
+    
+    with tqdm(total=len(chunks), desc="Embedding", unit="chunk") as pbar, \
+            ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        # Several batches are embedded at once (one Ollama request each)
+        futures = {}
+        for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+            futures[executor.submit(embeddings.embed_documents, texts[i:i + EMBED_BATCH_SIZE])] = i
+        
+        for future in as_completed(futures):
+            i = futures[future]
+            end = min(i + EMBED_BATCH_SIZE, len(chunks))
             try:
-                vectorstore.add_documents(documents=[chunk])
-                pbar.update(1)
+                pending_vectors.extend(future.result())
+                pending_texts.extend(texts[i:end])
+                pending_metadatas.extend(metadatas[i:end])
+                pbar.update(end - i)
                 
-                # Log every 50 chunks
-                if (i + 1) % 50 == 0:
-                    elapsed = (time.time() - start) / 60
-                    logger.info(f"Progress: {i+1}/{len(chunks)} | {elapsed:.1f}min")
+                if len(pending_texts) >= CHROMA_WRITE_BATCH_SIZE:
+                    write_pending()
                 
             except Exception as e:
-                logger.error(f"Failed at chunk {i+1}: {e}")
+                logger.error(f"Failed at chunks {i+1}-{end}: {e}")
+                for pending in futures:
+                    pending.cancel()
                 raise
     
+    if pending_texts:
+        write_pending()
+    
     duration = (time.time() - start) / 60
     logger.info(f"Vector store created in {duration:.1f}min")
     print(f"\n✅ Done in {duration:.1f} minutes\n")
@@ -148,6 +216,16 @@ def load_existing_vectorstore():
     return vectorstore
 
 
+def format_docs(docs):
+    """Join retrieved chunks into one context string, each tagged with its source"""
+    # A list comprehension, not a generator: str.join builds a list from a
+    # generator anyway, so passing the list skips that extra step
+    return "\n\n---\n\n".join([
+        f"[{doc.metadata.get('source', 'Unknown')}]\n{doc.page_content.strip()}"
+        for doc in docs
+    ])
+
+
 def setup_rag_chain(vectorstore):
     """Setup RAG chain"""
     llm = ChatOllama(model=MODEL_NAME, temperature=0, num_ctx=4096)
@@ -164,31 +242,55 @@ Answer:"""
     prompt = PromptTemplate(input_variables=["context", "question"], template=template)
     retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
     
-    def format_docs(docs):
-        return "\n\n---\n\n".join([
-            f"[{doc.metadata.get('source', 'Unknown')}]\n{doc.page_content.strip()}"
-            for doc in docs
-        ])
-    
-    rag_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    # Takes {"context", "question"}: query_documents retrieves the context
+    # itself, so the documents it logs are the ones the answer used
+    rag_chain = prompt | llm | StrOutputParser()
     
     logger.info("RAG chain initialized")
     print("✅ RAG ready\n")
     return rag_chain, retriever
 
 
-def query_documents(rag_chain, retriever, question):
+class QuestionCache:
+    """Reuse answers for questions that mean the same as an earlier one"""
+    
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.entries = deque(maxlen=QUESTION_CACHE_SIZE)  # (unit-length question embedding, question, answer)
+    
+    @staticmethod
+    def unit(embedding):
+        norm = math.sqrt(sum(v * v for v in embedding)) or 1.0
+        return [v / norm for v in embedding]
+    
+    def lookup(self, question):
+        """Return (question embedding, (earlier question, its answer) or None)"""
+        embedding = self.embeddings.embed_query(question)
+        vector = self.unit(embedding)
+        
+        for cached_vector, cached_question, answer in self.entries:
+            similarity = sum(a * b for a, b in zip(vector, cached_vector))
+            if similarity >= QUESTION_CACHE_THRESHOLD:
+                logger.info(f"Cache hit ({similarity:.3f}) | Query: {question} | Reused: {cached_question}")
+                return embedding, (cached_question, answer)
+        return embedding, None
+    
+    def add(self, embedding, question, answer):
+        self.entries.append((self.unit(embedding), question, answer))
+
+
+def query_documents(rag_chain, retriever, question, embedding=None):
     """Query and get answer"""
     print(f"\n❓ {question}")
     logger.info(f"Query: {question}")
     
-    source_docs = retriever.invoke(question)
-    answer = rag_chain.invoke(question)
+    # Retrieve once and answer from those documents; with the question's
+    # embedding already computed, search by vector instead of embedding again
+    if embedding is None:
+        source_docs = retriever.invoke(question)
+    else:
+        source_docs = retriever.vectorstore.similarity_search_by_vector(embedding, **retriever.search_kwargs)
+    answer = rag_chain.invoke({"context": format_docs(source_docs), "question": question})
     
     print(f"\n💡 {answer}\n")
        
@@ -199,6 +301,16 @@ def query_documents(rag_chain, retriever, question):
 
 def main():
     """Main RAG workflow"""
+    # Registered here, not at import: the PDF worker processes import this
+    # module too and must not log their own start and stop
+    atexit.register(log_shutdown)
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    # Log startup
+    logger.info("="*50)
+    logger.info(f"App started | Model: {MODEL_NAME}")
+    
     print("🚀 RAG System\n")
     
     # Check if rebuild needed
@@ -232,6 +344,7 @@ def main():
     
     # Setup RAG
     rag_chain, retriever = setup_rag_chain(vectorstore)
+    question_cache = QuestionCache(vectorstore.embeddings)
     
     # Interactive loop
     print("="*60)
@@ -250,7 +363,17 @@ def main():
             continue
         
         try:
-            query_documents(rag_chain, retriever, question)
+            # A similar earlier question skips retrieval and generation
+            # The question is shown with the answer, since a close match can
+            # still be a different question
+            embedding, cached = question_cache.lookup(question)
+            if cached is not None:
+                cached_question, answer = cached
+                print(f"\n💡 {answer}\n")
+                print(f"♻️ Reused answer to: {cached_question}")
+            else:
+                answer, _ = query_documents(rag_chain, retriever, question, embedding)
+                question_cache.add(embedding, question, answer)
             print("\n" + "-"*60 + "\n")
         except Exception as e:
             logger.error(f"Query error: {e}")
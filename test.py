@@ -1,18 +1,117 @@
+import argparse
+import asyncio
+import functools
 import os
+import sys
+import threading
+import time
+import httpx
+import orjson
 from dotenv import load_dotenv
-from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
+from ollama import AsyncClient
+from langchain_core.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.messages import get_buffer_string
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.globals import set_llm_cache
+from pydantic import Field
 
 
-load_dotenv()
-model = os.getenv("model_2")
-llm = OllamaLLM(model=model, temperature=0.7)
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+MAX_GREETING_BATCH = 16  # Most names sent to Ollama in one abatch call
 
 
-def test_prompt_template_partial():
+@functools.lru_cache(maxsize=1)
+def get_env():
+    """Read .env on first use, not at import, and return the environment"""
+    load_dotenv()
+    return os.environ
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm():
+    """Build the shared Ollama LLM on first use"""
+    env = get_env()
+    llm = OllamaLLM(model=env.get("model_2"), temperature=0.7)
+    
+    # Optional response cache for repeated test runs, keyed on the prompt and
+    # the model settings. The model samples at temperature 0.7, so a cached
+    # answer replaces a fresh one; set llm_cache=<sqlite file> in .env to opt
+    # in (e.g. llm_cache=.llm_cache.db) and keep it across runs
+    if env.get("llm_cache"):
+        from langchain_community.cache import SQLiteCache
+        set_llm_cache(SQLiteCache(database_path=env["llm_cache"]))
+    
+    # One pooled async HTTP client for streaming: requests reuse keep-alive
+    # connections to Ollama, and a dropped connection is retried before failing.
+    # Long generations are allowed up to 5 minutes.
+    llm._async_client = AsyncClient(
+        timeout=httpx.Timeout(300.0),
+        transport=httpx.AsyncHTTPTransport(retries=3, limits=HTTP_LIMITS),
+    )
+    return llm
+
+
+def get_max_concurrency():
+    """Requests kept in flight at once; matches the server's parallel slots"""
+    return int(get_env().get("OLLAMA_NUM_PARALLEL", "4"))
+
+
+async def read_line(prompt=""):
+    """input() that doesn't block the event loop or Ctrl+C"""
+    # The line is read on a daemon thread and handed back to the loop. Unlike
+    # asyncio.to_thread, nothing waits for a still-pending input() on exit,
+    # so Ctrl+C at the prompt ends the program straight away.
+    loop = asyncio.get_running_loop()
+    line = loop.create_future()
+    
+    def deliver(result, error):
+        if not line.done():
+            line.set_exception(error) if error else line.set_result(result)
+    
+    def read():
+        try:
+            result, error = input(prompt), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(deliver, result, error)
+        except RuntimeError:
+            pass  # The loop already closed
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await line
+
+
+def warm_up_model(prompt="Hi", **kwargs):
+    """Start loading the model in the background while the user types the first input"""
+    # One generated token is enough to load the weights and prefill the prompt;
+    # cache=False keeps an llm_cache hit from answering without loading the
+    # model. The task is returned so it isn't garbage collected while it runs
+    warm_up = get_llm().model_copy(update={"num_predict": 1, "cache": False})
+    
+    async def run():
+        try:
+            await warm_up.ainvoke(prompt, **kwargs)
+        except Exception:
+            pass  # The real request reports any connection problem
+    
+    return asyncio.create_task(run())
+
+
+async def run_many(prompts, n=None):
+    """Send prompts to the model together, n at a time, and return the answers in order"""
+    return await get_llm().abatch(
+        list(prompts),
+        config={"max_concurrency": n or get_max_concurrency()},
+        return_exceptions=True
+    )
+
+
+async def test_prompt_template_partial():
     print("Running test for prompt template with partial variables...\n")
     
     template = PromptTemplate(
@@ -20,39 +119,105 @@ def test_prompt_template_partial():
         input_variables=["name"],
         partial_variables={"greeting": "Hello"}
     )
+    # Plain str.format over the template text with the partial filled in;
+    # LangChain's formatter validates and re-parses the template on every call
+    format_greeting = functools.partial(template.template.format, **template.partial_variables)
     
+    # Lines are read on a daemon thread and queued while the model is busy; the
+    # worker sends everything waiting in the queue as one batch. Typing one
+    # name at a time behaves as before, piped input is answered in batches.
+    queue = asyncio.Queue()
+    warm_up = warm_up_model()
     
-    while True:
-        try:
-            user_input = input("You: ")
+    async def read_names():
+        while True:
+            try:
+                user_input = await read_line("You: ")
+            except EOFError:
+                user_input = "exit"
             if user_input.lower() in ['exit', 'quit']:
-                print("Goodbye!")
-                break
-            
-            final_prompt = template.format(name=user_input)
-            response = llm.invoke(final_prompt)
-            print(f"Assistant: {response}\n")
-        except Exception as e:
-            print(f"An error occurred: {e}. Retrying...")
-            
+                await queue.put(None)
+                return
+            await queue.put(user_input)
+    
+    try:
+        reader = asyncio.create_task(read_names())
+        done = False
+        while not done:
+            names = [await queue.get()]
+            while len(names) < MAX_GREETING_BATCH and not queue.empty():
+                names.append(queue.get_nowait())
+            if None in names:
+                names = names[:names.index(None)]
+                done = True
+        
+            responses = await run_many(format_greeting(name=name) for name in names)
+            for name, response in zip(names, responses):
+                if isinstance(response, Exception):
+                    print(f"An error occurred for '{name}': {response}")
+                else:
+                    print(f"Assistant: {response}\n")
+    
+        await reader
+    finally:
+        warm_up.cancel()
+    print("Goodbye!")
 
-def test_structured_output_parsing():
-    print("Running test for structured output parsing...\n ")
+
+class OrjsonOutputParser(JsonOutputParser):
+    """JsonOutputParser that parses plain JSON replies with orjson"""
     
-    parser = JsonOutputParser()
+    def parse_result(self, result, *, partial=False):
+        # Unfinished streamed JSON or a reply wrapped in a markdown fence
+        # fails here and takes LangChain's lenient path
+        try:
+            return orjson.loads(result[0].text.strip())
+        except orjson.JSONDecodeError:
+            return super().parse_result(result, partial=partial)
 
-    prompt = PromptTemplate(
-        template="Return a summary in JSON with keys 'title' and 'summary'.\n{format_instructions}\nText:{text}",
-        input_variables=["text"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-    )
 
-    chain = prompt | llm | parser
+# The JSON summary chain is built once: the parser, its format instructions and
+# the partially filled prompt are the same for every call
+SUMMARY_PARSER = OrjsonOutputParser()
+SUMMARY_PROMPT = PromptTemplate(
+    template="Return a summary in JSON with keys 'title' and 'summary'.\n{format_instructions}\nText:{text}",
+    input_variables=["text"],
+    partial_variables={"format_instructions": SUMMARY_PARSER.get_format_instructions()},
+)
 
-    result = chain.invoke({"text": "AI"})
-    print(result)
+
+@functools.lru_cache(maxsize=1)
+def get_summary_chain():
+    """Build the JSON summary chain on first use"""
+    return SUMMARY_PROMPT | get_llm() | SUMMARY_PARSER
+
+
+async def test_structured_output_parsing(texts=("AI", "Renewable energy", "Space exploration")):
+    print("Running test for structured output parsing...\n ")
+    
+    # The texts are streamed side by side, as many at a time as Ollama has
+    # parallel slots
+    limit = asyncio.Semaphore(get_max_concurrency())
+    summary_chain = get_summary_chain()
+    
+    async def summarize(text):
+        # JsonOutputParser yields a partial dict per chunk, so the title is
+        # printed as soon as it is complete (the summary key has started)
+        # instead of after the whole response
+        result = None
+        title_shown = False
+        async with limit:
+            async for result in summary_chain.astream({"text": text}):
+                if not title_shown and isinstance(result, dict) and "title" in result and "summary" in result:
+                    print(f"{text} title: {result['title']}")
+                    title_shown = True
+        return result
+    
+    results = await asyncio.gather(*map(summarize, texts), return_exceptions=True)
+    for text, result in zip(texts, results):
+        print(f"{text}: {result}")
     
-def test_chain_composition():
+async def test_summary_translation():
     print("Running test for chain composition...\n LCEL")
     
     prompt1 = PromptTemplate(
@@ -68,71 +233,119 @@ def test_chain_composition():
     
     chain = (
         prompt1 
-        | llm 
+        | get_llm() 
         | StrOutputParser() 
         | prompt2 
-        | llm 
+        | get_llm() 
         | StrOutputParser()
     )
     
-    result = chain.invoke({"text": "AI is transforming the world."})
+    result = await chain.ainvoke({"text": "AI is transforming the world."})
     print(result)
 
+
+async def stream_text(chain, inputs) -> str:
+    """Print a chain's output as it streams and return the full text.
+    
+    Chunks are written every 50ms (or every 16 chunks) instead of flushing
+    stdout for every single token.
+    """
+    buffer = []
+    parts = []
+    last_flush = time.perf_counter()
+    async for chunk in chain.astream(inputs):
+        buffer.append(chunk)
+        parts.append(chunk)
+        now = time.perf_counter()
+        if now - last_flush > 0.05 or len(buffer) >= 16:
+            sys.stdout.write("".join(buffer))
+            sys.stdout.flush()
+            buffer.clear()
+            last_flush = now
+    sys.stdout.write("".join(buffer))
+    sys.stdout.flush()
+    return "".join(parts)
+
+
 # stream dataing version
-def test_chain_composition():
+async def test_chain_composition():
     print("Running test for chain composition...\n LCEL")
     
     country_info = input("Enter information about a country: ")
     
-    prompt1 = PromptTemplate(
-        template="Explain about this country in short:\n{text}",
+    # One prompt for both answers: the places no longer wait for a first
+    # generation to finish and be fed back in as a second prompt
+    prompt = PromptTemplate(
+        template=(
+            "About this country:\n{text}\n\n"
+            "First explain about the country in short under the heading 'Overview'. "
+            "Then list the places that we can visit there under the heading 'Places to visit'."
+        ),
         input_variables=["text"]
     )
     
-    prompt2 = PromptTemplate(
-        template="What are the places that we can visit in this country :\n{summary}",
-        input_variables=["summary"]
-    )
-    
     
     # LCEL Chain Composition with Streaming
-    chain = (
-        prompt1 
-        | llm 
-        | StrOutputParser() 
-        | prompt2 
-        | llm 
-        | StrOutputParser()
-    )
+    chain = prompt | get_llm() | StrOutputParser()
     
     # Stream the output in real-time
     print("Streaming response:\n")
-    for chunk in chain.stream({f"text": country_info}):
-        print(chunk, end="", flush=True)
+    answer = await stream_text(chain, {"text": country_info})
     print("\n")  # New line after streaming completes
+    return answer
            
  
-def test_memory_chain_composition():
+class RenderedChatMessageHistory(InMemoryChatMessageHistory):
+    """In-memory chat history that also keeps each turn rendered as prompt text"""
+    
+    rendered: list[str] = Field(default_factory=list)
+    
+    def add_messages(self, messages):
+        super().add_messages(messages)
+        self.rendered.append(get_buffer_string(messages))
+    
+    def clear(self):
+        super().clear()
+        self.rendered = []
+
+
+async def test_memory_chain_composition():
      
      print("Running test for chain composition with memory...\n LCEL")
      
      # Store for chat history
-     store = {}
+     # The chat only uses one session, so its history is created once and
+     # handed back as is on every turn
+     history = RenderedChatMessageHistory()
      
      def get_session_history(session_id: str) -> BaseChatMessageHistory:
-         if session_id not in store:
-             store[session_id] = InMemoryChatMessageHistory()
-         return store[session_id]
+         return history
      
      # Create prompt with message history
-     prompt = ChatPromptTemplate.from_messages([
-         ("system", "You are a helpful AI assistant. Remember the conversation context."),
-         MessagesPlaceholder(variable_name="history"),
-         ("human", "{input}")
-     ])
+     # Earlier turns were rendered once when they were saved, so each turn only
+     # renders the new message; the text matches what a ChatPromptTemplate
+     # with a MessagesPlaceholder would produce. The system prompt goes in
+     # Ollama's own system field instead of the rendered text, so it lands in
+     # the model's system slot at the start of every request
+     def render_prompt(inputs):
+         return "\n".join([*history.rendered, f"Human: {inputs['input']}"])
+     
+     prompt = RunnableLambda(render_prompt)
        
      # Create chain with message history
-     chain = prompt | llm | StrOutputParser()
+     # Every turn re-sends the system prompt and earlier turns rendered exactly
+     # as before, so Ollama reuses their KV cache and only prefills the new
+     # message, as long as the model stays loaded between turns
+     chat_options = {
+         "keep_alive": -1,
+         "system": "You are a helpful AI assistant. Remember the conversation context."
+     }
+     chat_llm = get_llm().bind(**chat_options)
+     chain = prompt | chat_llm | StrOutputParser()
+     
+     # Load the model and prefill the system prompt while the first message
+     # is being typed
+     warm_up = warm_up_model("Human:", **chat_options)
      
      chain_with_history = RunnableWithMessageHistory(
          chain,
@@ -141,27 +354,61 @@ def test_memory_chain_composition():
          history_messages_key="history"
      )
      
-     print("Chat with memory started! Type 'exit' or 'quit' to end.\n")
+     try:
+         print("Chat with memory started! Type 'exit' or 'quit' to end.\n")
      
-     while True:
-            user_input = input("You: ")
-            if user_input.lower() in ['exit', 'quit']:
-                print("Goodbye!")
-                break
+         while True:
+                user_input = await read_line("You: ")
+                if user_input.lower() in ['exit', 'quit']:
+                    print("Goodbye!")
+                    break
             
-            response = chain_with_history.invoke(
-                {"input": user_input},
-                config={"configurable": {"session_id": "user_session"}}
-            )
-            print(f"Assistant: {response}\n")
-     
-      
-def main():
+                response = await chain_with_history.ainvoke(
+                    {"input": user_input},
+                    config={"configurable": {"session_id": "user_session"}}
+                )
+                print(f"Assistant: {response}\n")
+     finally:
+         warm_up.cancel()
+
+
+# Test name -> coroutine function, used by the command line below
+TESTS = {
+    "partial": test_prompt_template_partial,
+    "json": test_structured_output_parsing,
+    "translate": test_summary_translation,
+    "chain": test_chain_composition,
+    "memory": test_memory_chain_composition,
+}
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Run LangChain tests against Ollama")
+    parser.add_argument(
+        "tests",
+        nargs="+",
+        choices=list(TESTS),
+        help="Test(s) to run, in order, in this one process"
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Run the selected tests concurrently (only for json/translate, the others read input)"
+    )
+    return parser.parse_args()
+
+
+async def main():
+    """Run the tests chosen on the command line, e.g. json translate --parallel"""
+    args = parse_args()
+    selected = [TESTS[name] for name in args.tests]
     
-    # test_prompt_template_partial()
-    # test_structured_output_parsing()
-    # test_chain_composition()
-    # test_memory_chain_composition()    
+    if args.parallel:
+        await asyncio.gather(*(test() for test in selected))
+    else:
+        for test in selected:
+            await test()
             
 if __name__ == "__main__":
-    main()            
\ No newline at end of file
+    asyncio.run(main())